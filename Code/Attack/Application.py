@@ -1,12 +1,249 @@
 from Domain import *
+import collections.abc
+import queue
+import threading
+
+
+# Runs a search on a background thread, passing updates back through a queue so the caller's thread isn't blocked
+# Subclasses do the search in search, checking cancelled as they go
+class BackgroundTask:
+    # Marks the last update, which carries the search's result
+    done = "done"
+    progress = "progress"
+    # Marks an update carrying the error that stopped the search
+    failed = "failed"
+
+    def __init__(self):
+        self.updates = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    # Errors would otherwise end the thread without the caller finding out, so they are passed back as an update
+    def run(self):
+        try:
+            self.search()
+        except Exception as error:
+            self.updates.put((self.failed, error))
+
+    def search(self):
+        raise NotImplementedError()
+
+    # All the updates that have arrived since the last call, without waiting for more
+    def get_updates(self):
+        updates = []
+        while True:
+            try:
+                updates.append(self.updates.get_nowait())
+            except queue.Empty:
+                return updates
+
+
+# Crib drags a word in the background. The last update carries the ranked promising results
+class CribDraggingTask(BackgroundTask):
+    def __init__(self, xor_text, word):
+        super(CribDraggingTask, self).__init__()
+        self.xor_text = xor_text
+        self.word = word
+
+    # Each update carries the best promising results found so far, so only that many are held however long the search
+    def search(self):
+        promising_results = []
+        for progress, candidates in CribDraggingService.crib_drag_chunks(self.xor_text, self.word):
+            if self.cancelled.is_set():
+                return
+            if len(candidates) > 0:
+                promising_results = CribDraggingService.best_results(
+                    promising_results + candidates, CribDraggingService.promising_result_limit)
+            self.updates.put((self.progress, progress, promising_results))
+        if not self.cancelled.is_set():
+            self.updates.put((self.done, promising_results))
+
+
+# Extends a result in the background, as the search can take seconds on long texts
+# The last update carries the extended pair as (start index, string1, string2)
+class ExtensionTask(BackgroundTask):
+    def __init__(self, xor_text, index, string1, string2, fixed_characters):
+        super(ExtensionTask, self).__init__()
+        self.xor_text = xor_text
+        self.index = index
+        self.string1 = string1
+        self.string2 = string2
+        self.fixed_characters = fixed_characters
+
+    def search(self):
+        best = None
+        for progress, best in CribDraggingService.extend_result_steps(
+                self.xor_text, self.index, self.string1, self.string2, self.fixed_characters):
+            if self.cancelled.is_set():
+                return
+            self.updates.put((self.progress, progress))
+        if not self.cancelled.is_set():
+            self.updates.put((self.done, best))
+
+
+# Crib dragging results without the ones that overlap locked characters, filtered as they are looked up
+# Which offsets are blocked by a lock is kept in a bytearray, and only the offsets around a character are updated when
+# it is locked or unlocked, so checking an offset is a single lookup however many characters are locked
+class LockFilteredResults(collections.abc.Mapping):
+    def __init__(self, results, locked):
+        self.results = results
+        self.locked = locked
+        self.blocked = bytearray(len(results))
+        self.blocked_count = 0
+        # Counts changes to the blocked offsets, so positions worked out before a change aren't reused
+        self.version = 0
+        i = locked.find(1)
+        while i != -1:
+            self.update_blocked(i)
+            i = locked.find(1, i + 1)
+
+    # Work out again whether each offset whose result covers character i overlaps a locked character
+    def update_blocked(self, i):
+        length = self.results.length
+        self.version += 1
+        for k in range(max(i - length + 1, 0), min(i + 1, len(self.blocked))):
+            blocked = 1 if self.locked.find(1, k, k + length) != -1 else 0
+            self.blocked_count += blocked - self.blocked[k]
+            self.blocked[k] = blocked
+
+    def __len__(self):
+        return len(self.results) - self.blocked_count
+
+    # Runs of blocked offsets are skipped over with find rather than checked one by one
+    def __iter__(self):
+        k = self.blocked.find(0)
+        while k != -1:
+            yield k
+            k = self.blocked.find(0, k + 1)
+
+    def __contains__(self, k):
+        return k in self.results and not self.blocked[k]
+
+    def __getitem__(self, k):
+        if k not in self:
+            raise KeyError(k)
+        return self.results[k]
+
+    # Offset of the result at position when the unblocked offsets are counted in order
+    # Each blocked offset before it moves it along by one, and there are only as many of those as locks cover
+    def offset_at(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError("result position out of range")
+        offset = position
+        k = self.blocked.find(1)
+        while k != -1 and k <= offset:
+            offset += 1
+            k = self.blocked.find(1, k + 1)
+        return offset
+
+    def position_of(self, offset):
+        if offset not in self:
+            raise ValueError("result offset is blocked or out of range")
+        return offset - self.blocked.count(1, 0, offset)
+
+
+# Lock filtered results in offset order, indexed by position, so they can be shown in a list without copying them
+class LockFilteredResultList(collections.abc.Sequence):
+    def __init__(self, lock_filtered_results):
+        self.lock_filtered_results = lock_filtered_results
+        # Rows are asked for in runs, so the last lookup is kept to find the next offset without counting from the start
+        self.last_position = None
+        self.last_offset = None
+        self.last_version = None
+
+    def __len__(self):
+        return len(self.lock_filtered_results)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if (self.last_version == self.lock_filtered_results.version and position == self.last_position + 1 and
+                position < len(self)):
+            offset = self.lock_filtered_results.blocked.find(0, self.last_offset + 1)
+        else:
+            offset = self.lock_filtered_results.offset_at(position)
+        self.last_position = position
+        self.last_offset = offset
+        self.last_version = self.lock_filtered_results.version
+        return self.lock_filtered_results[offset]
+
+    # Results know their offset, so they are found without searching through the others
+    def index(self, result):
+        offset = getattr(result, 'offset', None)
+        if offset not in self.lock_filtered_results:
+            raise ValueError("result is not in the list")
+        if self.lock_filtered_results[offset].byte_array != result.byte_array:
+            raise ValueError("result is not in the list")
+        return self.lock_filtered_results.position_of(offset)
+
+
+# Keystream shared by every loaded ciphertext, for when they were all encrypted with the same key
+# Each known byte of the keystream gives the plaintext of every ciphertext long enough to reach it, so a crib confirmed
+# in one ciphertext is straight away known in all of the others
+class KeystreamSessionModel:
+    def __init__(self, cipher_texts):
+        self.cipher_texts = list(cipher_texts)
+        length = max([len(cipher_text.byte_array) for cipher_text in self.cipher_texts], default=0)
+        self.keystream = bytearray(length)
+        # One byte per keystream byte, set to 1 once it is known
+        self.known = bytearray(length)
+        self.word = None
+        self.results = []
+
+    # Take characters start to end of a pair's plaintexts into the keystream, where string1 is the plaintext of
+    # ciphertext t. A character the pair no longer knows is only forgotten if the pair wrote it, so clearing a character
+    # another pair recovered doesn't lose it
+    def take_pair_plaintexts(self, crib_dragging_mode_model, t, start, end):
+        cipher_bytes = self.cipher_texts[t].byte_array
+        string1 = crib_dragging_mode_model.string1
+        known = crib_dragging_mode_model.known
+        written = crib_dragging_mode_model.written
+        for i in range(start, end):
+            if known[i]:
+                self.keystream[i] = string1[i] ^ cipher_bytes[i]
+                self.known[i] = 1
+                written[i] = 1
+            elif written[i]:
+                self.known[i] = 0
+                written[i] = 0
+
+    # Fill in a pair's plaintexts from the keystream, where the pair is the xor of ciphertexts t and u
+    def fill_pair_plaintexts(self, crib_dragging_mode_model, t, u):
+        length = len(crib_dragging_mode_model.known)
+        crib_dragging_mode_model.string1[:] = Text.xor_buffers(self.cipher_texts[t].view[:length], self.keystream)
+        crib_dragging_mode_model.string2[:] = Text.xor_buffers(self.cipher_texts[u].view[:length], self.keystream)
+        crib_dragging_mode_model.known[:] = self.known[:length]
+
+    # Crib drag the word against every ciphertext at once, keeping the best results
+    def set_crib_dragging_word(self, word):
+        self.word = word
+        self.results = []
+        if word is not None:
+            self.results = CribDraggingService.crib_drag_texts(
+                self.cipher_texts, word, CribDraggingService.promising_result_limit)
 
 
 class CribDraggingModeModel:
-    def __init__(self, xor_text):
+    # A keystream session can be given with the indexes of the two ciphertexts the pair was made from. The pair starts
+    # from what the session knows, and every character it changes is passed back to the session
+    def __init__(self, xor_text, keystream_session=None, roots=None):
         self.xor_text = xor_text
-        self.string1 = [None for _ in range(len(xor_text.byte_array))]
-        self.string2 = [None for _ in range(len(xor_text.byte_array))]
-        self.locked = []
+        # Bytes of the two plaintexts, which only mean anything where the matching byte of known is 1
+        self.string1 = bytearray(len(xor_text.byte_array))
+        self.string2 = bytearray(len(xor_text.byte_array))
+        self.known = bytearray(len(xor_text.byte_array))
+        # One byte per character, set to 1 while the character is locked
+        self.locked = bytearray(len(xor_text.byte_array))
+        # One byte per character, set to 1 where this pair has written the character to the keystream session
+        self.written = bytearray(len(xor_text.byte_array))
         self.word = None
         self.lock_filtered_all_results = {}
         self.lock_filtered_promising_results = {}
@@ -14,53 +251,122 @@ class CribDraggingModeModel:
         self.promising_results = {}
         self.selected_result = None
         self.selected_result_index = None
+        # Crib dragging a pair can't tell which of the two plaintexts holds the crib, so the user chooses. The crib
+        # goes into string2, the plaintext of the second ciphertext, when this is set, and into string1 otherwise
+        self.crib_in_string2 = False
+        self.crib_dragging_task = None
+        self.crib_dragging_progress = 0
+        # Error that stopped the last background search, or None
+        self.crib_dragging_error = None
+        self.extension_task = None
+        self.extension_progress = 0
+        # Whether the running extension puts its crib side into string2, as chosen when it started
+        self.extension_in_string2 = False
+        # Error that stopped the last extension, or None
+        self.extension_error = None
+        # Characters changed since the view last took them, as (start, end), or None if nothing has changed
+        self.dirty_range = None
+        self.keystream_session = keystream_session
+        self.roots = roots
+        if keystream_session is not None:
+            keystream_session.fill_pair_plaintexts(self, roots[0], roots[1])
 
+    # Filtered results are updated for just the character that changed rather than filtered again from scratch
     def lock(self, i):
-        if i not in self.locked:
-            self.locked.append(i)
-            self.calculate_lock_filtered_results()
+        if self.locked[i]:
+            return
+        self.locked[i] = 1
+        if self.word is None:
+            return
+        self.lock_filtered_all_results.update_blocked(i)
+        for k in list(self.lock_filtered_promising_results):
+            if k <= i < k + len(self.lock_filtered_promising_results[k].byte_array):
+                del self.lock_filtered_promising_results[k]
 
     def unlock(self, i):
-        self.locked.remove(i)
-        self.calculate_lock_filtered_results()
+        if not self.locked[i]:
+            return
+        self.locked[i] = 0
+        if self.word is None:
+            return
+        self.lock_filtered_all_results.update_blocked(i)
+        # Promising results that come back have to go back in their ranked place, and there are few of them
+        self.calculate_lock_filtered_promising_results()
+
+    def is_locked(self, i):
+        return self.locked[i] == 1
 
     def get_string1_char(self, i):
-        return self.string1[i]
+        return chr(self.string1[i]) if self.known[i] else None
 
     def get_string2_char(self, i):
-        return self.string2[i]
+        return chr(self.string2[i]) if self.known[i] else None
 
+    # The whole substring is written with slice assignments, the other string being the substring xored with the
+    # xor text in one go
     def set_string1_substring(self, i, substring):
-        if i + len(substring) > len(self.string1):
-            return
-        for j in range(i, len(substring) + i):
-            if j in self.locked:
-                return
-        for j in range(len(substring)):
-            self.set_string1_character(i + j, substring[j])
+        self.set_substring(self.string1, self.string2, i, substring)
 
     def set_string2_substring(self, i, substring):
-        if i + len(substring) > len(self.string2):
+        self.set_substring(self.string2, self.string1, i, substring)
+
+    def set_substring(self, string, other_string, i, substring):
+        end = i + len(substring)
+        if end > len(string) or self.is_range_locked(i, len(substring)):
             return
-        for j in range(i, len(substring) + i):
-            if j in self.locked:
-                return
-        for j in range(len(substring)):
-            self.set_string2_character(i + j, substring[j])
+        substring_bytes = substring.encode('latin-1')
+        string[i:end] = substring_bytes
+        other_string[i:end] = Text.xor_buffers(substring_bytes, self.xor_text.view[i:end])
+        self.known[i:end] = b'\x01' * len(substring_bytes)
+        self.characters_changed(i, end)
 
     def set_string1_character(self, i, char):
-        if i in self.locked or i >= len(self.string1) or self.string1[i] == char:
-            return
-        self.string1[i] = char
-        self.string2[i] = None if char is None else chr(ord(char) ^ self.xor_text.byte_array[i])
+        self.set_character(self.string1, self.string2, i, char)
 
     def set_string2_character(self, i, char):
-        if i in self.locked or i >= len(self.string2) or self.string2[i] == char:
+        self.set_character(self.string2, self.string1, i, char)
+
+    def set_character(self, string, other_string, i, char):
+        if i >= len(string) or self.locked[i]:
             return
-        self.string2[i] = char
-        self.string1[i] = None if char is None else chr(ord(char) ^ self.xor_text.byte_array[i])
+        if char is None:
+            if not self.known[i]:
+                return
+            string[i] = other_string[i] = self.known[i] = 0
+        else:
+            if self.known[i] and string[i] == ord(char):
+                return
+            string[i] = ord(char)
+            other_string[i] = ord(char) ^ self.xor_text.byte_array[i]
+            self.known[i] = 1
+        self.characters_changed(i, i + 1)
+
+    # Confirmed characters are passed on to the keystream session, which makes them known in every other ciphertext
+    def characters_changed(self, start, end):
+        self.mark_dirty(start, end)
+        if self.keystream_session is not None:
+            self.keystream_session.take_pair_plaintexts(self, self.roots[0], start, end)
+
+    # Read only views of both plaintexts and which of their bytes are known, without copying them
+    def export_plaintexts(self):
+        return memoryview(self.string1).toreadonly(), memoryview(self.string2).toreadonly(),\
+            memoryview(self.known).toreadonly()
+
+    # Changed characters are merged into one range, so the view can update them all at once
+    def mark_dirty(self, start, end):
+        if self.dirty_range is None:
+            self.dirty_range = (start, end)
+        else:
+            self.dirty_range = (min(self.dirty_range[0], start), max(self.dirty_range[1], end))
+
+    # The range of characters changed since the last call, or None if nothing has changed
+    def take_dirty_range(self):
+        dirty_range = self.dirty_range
+        self.dirty_range = None
+        return dirty_range
 
     def set_crib_dragging_word(self, word):
+        self.cancel_crib_dragging()
         self.word = word
         self.lock_filtered_all_results = {}
         self.lock_filtered_promising_results = {}
@@ -73,19 +379,81 @@ class CribDraggingModeModel:
             self.promising_results = results[1]
             self.calculate_lock_filtered_results()
 
+    # Start crib dragging the word on a background thread, stopping any search already running
+    # All results can be looked up straight away, and promising results arrive as poll_crib_dragging is called
+    # Words that can't be written as latin-1 raise UnicodeEncodeError before anything is changed
+    def start_crib_dragging_word(self, word):
+        all_results = CribDragResults(self.xor_text, word)
+        self.set_crib_dragging_word(None)
+        self.crib_dragging_error = None
+        self.word = word
+        self.all_results = all_results
+        self.calculate_lock_filtered_results()
+        self.crib_dragging_task = CribDraggingTask(self.xor_text, word)
+        self.crib_dragging_task.start()
+
+    # Take in the results the background search has found so far, returning its progress from 0 to 1, whether it
+    # has finished, and whether the promising results changed. Promising results are the best found so far, until the
+    # search finishes with the best overall
+    def poll_crib_dragging(self):
+        task = self.crib_dragging_task
+        if task is None:
+            return 1, True, False
+        updates = task.get_updates()
+        if len(updates) == 0:
+            return self.crib_dragging_progress, False, False
+        # Each update replaces the promising results before it, so only the latest is needed
+        update = updates[-1]
+        if update[0] == CribDraggingTask.failed:
+            self.crib_dragging_task = None
+            self.crib_dragging_error = update[1]
+            return self.crib_dragging_progress, True, False
+        done = update[0] == CribDraggingTask.done
+        if done:
+            self.crib_dragging_task = None
+            self.crib_dragging_progress = 1
+            promising_results = update[1]
+        else:
+            self.crib_dragging_progress, promising_results = update[1:]
+        # Progress updates often carry the same results as the last one, which don't need filtering or showing again
+        if [k for k, v in promising_results] == list(self.promising_results):
+            return self.crib_dragging_progress, done, False
+        self.promising_results = {}
+        for k, v in promising_results:
+            self.promising_results[k] = v
+        self.calculate_lock_filtered_promising_results()
+        return self.crib_dragging_progress, done, True
+
+    # Stop the background search, keeping the results it has found so far
+    def cancel_crib_dragging(self):
+        if self.crib_dragging_task is not None:
+            self.crib_dragging_task.cancel()
+            self.crib_dragging_task = None
+
+    def is_crib_dragging(self):
+        return self.crib_dragging_task is not None
+
+    # All results are filtered as they are looked up, so locking characters doesn't copy them
     def calculate_lock_filtered_results(self):
-        self.lock_filtered_all_results = {}
+        self.lock_filtered_all_results = LockFilteredResults(self.all_results, self.locked)
+        self.calculate_lock_filtered_promising_results()
+
+    # Promising results are kept in their ranked order
+    def calculate_lock_filtered_promising_results(self):
         self.lock_filtered_promising_results = {}
-        for k, v in self.all_results.items():
-            any_locked = False
-            for i in range(k, k + len(v.ascii_string)):
-                if i in self.locked:
-                    any_locked = True
-                    break
-            if not any_locked:
-                self.lock_filtered_all_results[k] = v
-                if k in self.promising_results:
-                    self.lock_filtered_promising_results[k] = v
+        for k, v in self.promising_results.items():
+            if not self.is_range_locked(k, len(v.byte_array)):
+                self.lock_filtered_promising_results[k] = v
+
+    # All results that don't overlap locked characters, as a list that can be indexed without copying them
+    def get_lock_filtered_all_result_list(self):
+        if self.word is None:
+            return []
+        return LockFilteredResultList(self.lock_filtered_all_results)
+
+    # Whether any of the length characters starting at i are locked
+    def is_range_locked(self, i, length):
+        return self.locked.find(1, i, i + length) != -1
 
     def clear_crib_dragging_word(self):
         self.set_crib_dragging_word(None)
@@ -95,17 +463,69 @@ class CribDraggingModeModel:
             self.selected_result = None
             self.selected_result_index = None
             return
-        for k, v in self.all_results.items():
-            if v == result:
-                self.selected_result_index = k
-                self.selected_result = result
-                return
+        self.selected_result_index = result.offset
+        self.selected_result = result
 
+    def set_crib_in_string2(self, value):
+        self.crib_in_string2 = value
+
+    # The other string is the crib xored with the xor text, so only the crib has to be written
+    # Applying again after choosing the other string moves the crib over
     def apply_selected_result(self):
-        string1 = self.word
-        string2 = self.selected_result.ascii_string
-        self.set_string1_substring(self.selected_result_index, string1)
-        self.set_string2_substring(self.selected_result_index, string2)
+        if self.crib_in_string2:
+            self.set_string2_substring(self.selected_result_index, self.word)
+        else:
+            self.set_string1_substring(self.selected_result_index, self.word)
+
+    # Grow the selected result outwards on a background thread as far as it still looks like english, stopping any
+    # extension already running. The strings are filled in once poll_extension finds it has finished
+    # Locked characters are kept, and the search can't pass locked characters that aren't known
+    def start_extending_selected_result(self):
+        self.cancel_extending()
+        get_crib_char = self.get_string2_char if self.crib_in_string2 else self.get_string1_char
+        fixed_characters = {}
+        i = self.locked.find(1)
+        while i != -1:
+            fixed_characters[i] = get_crib_char(i)
+            i = self.locked.find(1, i + 1)
+        self.extension_in_string2 = self.crib_in_string2
+        self.extension_error = None
+        self.extension_progress = 0
+        self.extension_task = ExtensionTask(
+            self.xor_text, self.selected_result_index, self.word, self.selected_result.ascii_string, fixed_characters)
+        self.extension_task.start()
+
+    # Returns the extension's progress from 0 to 1 and whether it has finished
+    def poll_extension(self):
+        task = self.extension_task
+        if task is None:
+            return 1, True
+        updates = task.get_updates()
+        if len(updates) == 0:
+            return self.extension_progress, False
+        update = updates[-1]
+        if update[0] == ExtensionTask.failed:
+            self.extension_task = None
+            self.extension_error = update[1]
+            return self.extension_progress, True
+        if update[0] == ExtensionTask.progress:
+            self.extension_progress = update[1]
+            return self.extension_progress, False
+        self.extension_task = None
+        self.extension_progress = 1
+        start, crib_string, other_string = update[1]
+        set_crib_character = self.set_string2_character if self.extension_in_string2 else self.set_string1_character
+        for j in range(len(crib_string)):
+            set_crib_character(start + j, crib_string[j])
+        return self.extension_progress, True
+
+    def cancel_extending(self):
+        if self.extension_task is not None:
+            self.extension_task.cancel()
+            self.extension_task = None
+
+    def is_extending(self):
+        return self.extension_task is not None
 
 
 class ApplicationModel:
@@ -113,28 +533,103 @@ class ApplicationModel:
         self.path = ""
         self.cipher_texts = []
         self.promising_pairs = []
+        # Index in all_pairs of each promising pair
+        self.promising_pair_indexes = []
         self.all_pairs = []
         self.pair_roots = []
+        self.pair_scores = []
         self.selected_pair = None
+        # Used to score how likely each pair is to share a key
+        self.pair_scorer = CribDraggingService.pair_scorer
+        # Number of worker processes used to xor pairs, None for one per CPU
+        self.pair_workers = None
+        # Pair results from the last calculation, keyed on the pair of ciphertexts they came from
+        self.pair_cache = {}
+        self.paired_cipher_texts = ()
+        self.paired_scorer = None
+        # Keystream recovered so far, shared by every pair of the loaded ciphertexts
+        self.keystream_session = None
+        # Only when every ciphertext was encrypted with the same key do pairs share what they recover, as with batch
+        # mode's --all-texts. Otherwise the keystream of one pair would turn into garbage in the others
+        self.shared_keystream = False
+
+    # Load a file of new-line delimited hex ciphertexts
+    def load_cipher_texts(self, path):
+        self.cipher_texts = [Text.from_hex_string(hex_string) for hex_string in open(path, 'r').read().splitlines()]
+        self.path = path
 
     def calculate_pairs(self):
+        # Nothing to do if the ciphertexts haven't changed since the pairs were last calculated
+        cipher_texts = tuple(self.cipher_texts)
+        if cipher_texts == self.paired_cipher_texts and self.pair_scorer is self.paired_scorer:
+            return
+        # Cached scores are no use once the scorer changes
+        if self.pair_scorer is not self.paired_scorer:
+            self.pair_cache = {}
+        self.paired_cipher_texts = cipher_texts
+        self.paired_scorer = self.pair_scorer
+
         self.promising_pairs = []
+        self.promising_pair_indexes = []
         self.all_pairs = []
         self.pair_roots = []
+        self.pair_scores = []
         if len(self.cipher_texts) == 0:
+            self.pair_cache = {}
             return
 
-        number_of_texts = len(self.cipher_texts)
+        # When none of the ciphertexts have been paired before, do them all in one batch
+        # Otherwise only the pairs involving new ciphertexts need calculating
+        cached_texts = set()
+        for text1, text2 in self.pair_cache:
+            cached_texts.add(text1)
+            cached_texts.add(text2)
+        if not any(cipher_text in cached_texts for cipher_text in cipher_texts):
+            self.pair_cache = {}
+            byte_arrays = [cipher_text.byte_array for cipher_text in cipher_texts]
+            for i, j, xor_bytes, score in CribDraggingService.xor_all_pairs(
+                    byte_arrays, self.pair_scorer, self.pair_workers):
+                self.pair_cache[(cipher_texts[i], cipher_texts[j])] = (Text.from_byte_array(xor_bytes), score)
+
+        # Rebuild the cache from the current pairs so pairs of removed ciphertexts are dropped
+        pair_cache = {}
+        promising_scores = []
+        number_of_texts = len(cipher_texts)
         for i in range(number_of_texts):
             for j in range(i + 1, number_of_texts):
-                xor = self.cipher_texts[i].xor(self.cipher_texts[j])
+                key = (cipher_texts[i], cipher_texts[j])
+                pair = self.pair_cache.get(key)
+                if pair is None:
+                    xor_bytes, score = CribDraggingService.xor_pair(
+                        key[0].byte_array, key[1].byte_array, self.pair_scorer)
+                    pair = (Text.from_byte_array(xor_bytes), score)
+                pair_cache[key] = pair
+
+                xor, score = pair
                 self.pair_roots.append((i, j))
                 self.all_pairs.append(xor)
-                if CribDraggingService.is_likely_plaintext_xor(xor):
-                    self.promising_pairs.append(xor)
+                self.pair_scores.append(score)
+                if self.pair_scorer.is_promising(score):
+                    promising_scores.append((score, len(self.all_pairs) - 1))
+        self.pair_cache = pair_cache
+
+        # Most promising pairs first
+        promising_scores.sort(key=lambda promising_score: -promising_score[0])
+        self.promising_pair_indexes = [index for score, index in promising_scores]
+        self.promising_pairs = [self.all_pairs[index] for index in self.promising_pair_indexes]
+
+    # The session is started again whenever the ciphertexts change
+    def get_keystream_session(self):
+        if self.keystream_session is None or self.keystream_session.cipher_texts != self.cipher_texts:
+            self.keystream_session = KeystreamSessionModel(self.cipher_texts)
+        return self.keystream_session
 
+    # When the keystream is shared, the pair shares its characters with every other ciphertext through the keystream
+    # session
     def build_crib_dragging_model(self):
-        return CribDraggingModeModel(self.selected_pair)
+        roots = self.pair_roots[self.all_pairs.index(self.selected_pair)]
+        keystream_session = self.get_keystream_session() if self.shared_keystream else None
+        return CribDraggingModeModel(self.selected_pair, keystream_session, roots)
 
 
 class NavigationModel:
@@ -148,6 +643,7 @@ class NavigationModel:
 
     def show_screen(self, name):
         if self.current_screen is not None:
+            self.screen_dictionary[self.current_screen].on_leave()
             self.screen_dictionary[self.current_screen].pack_forget()
         self.current_screen = name
         self.screen_dictionary[self.current_screen].on_enter()
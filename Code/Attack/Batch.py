@@ -0,0 +1,62 @@
+from Application import *
+import json
+import sys
+
+
+# Runs crib dragging over a file of ciphertexts without the user interface, writing results as json lines
+class BatchCribDragging:
+    def __init__(self, application_model, output=sys.stdout):
+        self.application_model = application_model
+        self.output = output
+
+    def run(self, path, cribs, all_pairs=False, all_texts=False):
+        self.application_model.load_cipher_texts(path)
+        if all_texts:
+            self.run_all_texts(cribs)
+            return
+        self.application_model.calculate_pairs()
+
+        # Pairs are gone through by index, so they don't have to be searched for in all_pairs
+        if all_pairs:
+            indexes = range(len(self.application_model.all_pairs))
+        else:
+            indexes = self.application_model.promising_pair_indexes
+        for index in indexes:
+            pair = self.application_model.all_pairs[index]
+            roots = self.application_model.pair_roots[index]
+            self.write({
+                "type": "pair",
+                "pair": list(roots),
+                "score": self.application_model.pair_scores[index],
+                "xor": pair.hex_string
+            })
+            language_model = CribDraggingService.get_language_model()
+            for crib, offset, result in CribDraggingService.crib_drag_words(pair, cribs):
+                self.write({
+                    "type": "result",
+                    "pair": list(roots),
+                    "crib": crib,
+                    "offset": offset,
+                    "result": result.ascii_string,
+                    "score": language_model.mean_score(result.byte_array)
+                })
+
+    # Crib drag every ciphertext at once against the keystream they share, rather than pair by pair
+    def run_all_texts(self, cribs):
+        session = self.application_model.get_keystream_session()
+        for crib in cribs:
+            session.set_crib_dragging_word(crib)
+            for text, offset, plaintexts in session.results:
+                self.write({
+                    "type": "text_result",
+                    "text": text,
+                    "crib": crib,
+                    "offset": offset,
+                    "plaintexts": [None if plaintext is None else plaintext.ascii_string for plaintext in plaintexts],
+                    "score": CribDraggingService.plaintexts_score(text, plaintexts)
+                })
+
+    # Results are flushed as they are written so they can be streamed into other tools
+    def write(self, record):
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
@@ -1,4 +1,5 @@
 import tkinter
+import tkinter.font
 
 
 class NavigationPanel(tkinter.Frame):
@@ -28,56 +29,156 @@ class NavigationPanel(tkinter.Frame):
             self.buttons[name]['state'] = "disabled"
 
 
+# List of texts that only puts the rows that can be seen into the list box, so it can show huge sequences quickly
+# The texts can be any sequence, and the selection is kept as an index into it rather than as a row of the list box
 class CipherTextDisplay(tkinter.Frame):
+    # Number of rows shown before the list box has been laid out
+    default_rows = 10
+
     def __init__(self, master):
         super(CipherTextDisplay, self).__init__(master)
         self.cipher_texts = []
+        self.first_row = 0
+        # The selected text is kept itself, as positions in the sequence can change under it before the next update
+        self.selected = None
+        self.selected_index = None
+        self.row_height = None
+        self.selection_changed = None
 
         self.list_box = tkinter.Listbox(self)
-        scrollbar = tkinter.Scrollbar(self)
+        self.scrollbar = tkinter.Scrollbar(self)
 
-        scrollbar['command'] = self.list_box.yview
-        self.list_box['yscrollcommand'] = scrollbar.set
+        self.scrollbar['command'] = self.on_scroll
         self.list_box['font'] = ("Consolas", 10)
         self.list_box['activestyle'] = "none"
+        self.list_box['exportselection'] = False
+        self.list_box.bind('<<ListboxSelect>>', self.on_list_box_select)
+        self.list_box.bind('<Configure>', self.on_configure)
+        self.list_box.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.list_box.bind('<Button-4>', lambda e: self.scroll(-1, "units"))
+        self.list_box.bind('<Button-5>', lambda e: self.scroll(1, "units"))
+        self.list_box.bind('<Up>', lambda e: self.move_selection(-1))
+        self.list_box.bind('<Down>', lambda e: self.move_selection(1))
+        self.list_box.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows()))
+        self.list_box.bind('<Next>', lambda e: self.move_selection(self.visible_rows()))
+        self.list_box.bind('<Home>', lambda e: self.move_selection(-len(self.cipher_texts)))
+        self.list_box.bind('<End>', lambda e: self.move_selection(len(self.cipher_texts)))
 
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
         self.list_box.grid(row=0, column=0, sticky='nesw')
-        scrollbar.grid(row=0, column=1, sticky='ns')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
 
+    # The selected text stays selected if it is in the new texts, found by identity rather than by its string
     def update(self, cipher_texts):
+        selected = self.selected
         self.cipher_texts = cipher_texts
-        selected_index = self.list_box.curselection()
-        if selected_index != ():
-            selected = self.list_box.get(selected_index[0])
-        else:
-            selected = None
-
-        self.list_box.delete(0, tkinter.END)
-        new_selection = 0
-        for i in range(len(cipher_texts)):
-            self.list_box.insert(i, cipher_texts[i].ascii_string)
-            if self.list_box.get(i) == selected:
-                new_selection = i
-
-        self.list_box.selection_set(new_selection)
-        self.list_box.activate(new_selection)
+        self.select(None)
+        if len(cipher_texts) > 0:
+            self.select(0)
+            if selected is not None:
+                try:
+                    self.selected_index = cipher_texts.index(selected)
+                    self.selected = selected
+                except ValueError:
+                    pass
+        self.render()
 
     def set_selection(self, item):
-        i = self.cipher_texts.index(item)
-        if i > 0:
-            self.list_box.selection_set(i)
-            self.list_box.activate(i)
+        self.selected_index = self.cipher_texts.index(item)
+        self.selected = item
+        self.see(self.selected_index)
+        self.render()
 
     def get_selection(self):
+        return self.selected
+
+    def select(self, index):
+        self.selected_index = index
+        self.selected = None if index is None else self.cipher_texts[index]
+
+    def bind_selection_changed(self, func):
+        self.selection_changed = func
+
+    # Number of whole rows that fit in the list box
+    def visible_rows(self):
+        if self.row_height is None or self.list_box.winfo_height() <= 1:
+            return self.default_rows
+        border = 2 * (int(self.list_box['borderwidth']) + int(self.list_box['highlightthickness']))
+        return max(1, (self.list_box.winfo_height() - border) // self.row_height)
+
+    # Put the visible texts into the list box, replacing the rows that were there
+    def render(self):
+        rows = self.visible_rows()
+        self.first_row = max(0, min(self.first_row, len(self.cipher_texts) - rows))
+        last_row = min(self.first_row + rows, len(self.cipher_texts))
+
+        self.list_box.delete(0, tkinter.END)
+        strings = [self.cipher_texts[i].ascii_string for i in range(self.first_row, last_row)]
+        if len(strings) > 0:
+            self.list_box.insert(0, *strings)
+        if self.selected_index is not None and self.first_row <= self.selected_index < last_row:
+            self.list_box.selection_set(self.selected_index - self.first_row)
+            self.list_box.activate(self.selected_index - self.first_row)
+
+        if len(self.cipher_texts) == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first_row / len(self.cipher_texts), last_row / len(self.cipher_texts))
+
+    # Scroll so the text at index is in view
+    def see(self, index):
+        rows = self.visible_rows()
+        if index < self.first_row:
+            self.first_row = index
+        elif index >= self.first_row + rows:
+            self.first_row = index - rows + 1
+
+    def scroll(self, number, what):
+        if what == "pages":
+            number *= self.visible_rows()
+        self.first_row += int(number)
+        self.render()
+        return "break"
+
+    # Called by the scroll bar as either ("moveto", fraction) or ("scroll", number, "units" or "pages")
+    def on_scroll(self, *args):
+        if args[0] == "moveto":
+            self.first_row = int(float(args[1]) * len(self.cipher_texts))
+            self.render()
+        else:
+            self.scroll(int(args[1]), args[2])
+
+    def move_selection(self, step):
+        if len(self.cipher_texts) == 0:
+            return "break"
+        if self.selected_index is None:
+            index = 0
+        else:
+            index = max(0, min(self.selected_index + step, len(self.cipher_texts) - 1))
+        if index != self.selected_index:
+            self.select(index)
+            self.see(index)
+            self.render()
+            self.notify_selection_changed()
+        return "break"
+
+    # Clicking a row selects the text shown there
+    def on_list_box_select(self, e=None):
         selection = self.list_box.curselection()
         if len(selection) < 1:
-            return None
-        return self.cipher_texts[selection[0]]
+            return
+        self.select(self.first_row + selection[0])
+        self.notify_selection_changed()
 
-    def bind_selection_changed(self, func):
-        self.list_box.bind('<<ListboxSelect>>', lambda e: func(self.get_selection()))
+    def on_configure(self, e=None):
+        if self.row_height is None:
+            self.row_height = tkinter.font.Font(font=self.list_box['font']).metrics('linespace') + 1
+        self.render()
+
+    def notify_selection_changed(self):
+        if self.selection_changed is not None:
+            self.selection_changed(self.get_selection())
 
 
 class AsciiCharacterPair(tkinter.Frame):
@@ -124,6 +225,13 @@ class AsciiCharacterPair(tkinter.Frame):
     def bind_locked_changed(self, func):
         self.lock_varaible.trace('w', lambda *args: func(self.lock_varaible.get()))
 
+    def get_locked(self):
+        return self.lock_varaible.get()
+
+    def set_locked(self, value):
+        if self.lock_varaible.get() != value:
+            self.lock_varaible.set(value)
+
     def get_char1(self):
         return self.box1.get_char()
 
@@ -1,35 +1,154 @@
+from array import array
+import abc
+import bisect
+import collections
+import collections.abc
+import concurrent.futures
+import functools
+import heapq
 import math
+import mmap
+import os
 import re
+import struct
+import sys
+import threading
 
 # Represents a string, and allows conversion between ascii, hex, and bytes
+# Only the bytes are stored up front, the ascii and hex forms are worked out the first time they are asked for
 class Text:
-    def __init__(self, ascii_string, byte_array, hex_string):
-        self.ascii_string = ascii_string
-        self.byte_array = byte_array
-        self.hex_string = hex_string
+    __slots__ = ('byte_array', '_ascii_string', '_hex_string')
+
+    # Character shown for each byte value, with non-printable bytes replaced by a dot
+    ascii_table = ''.join([chr(byte) if chr(byte).isprintable() else '·' for byte in range(256)])
+
+    def __init__(self, byte_array, ascii_string=None, hex_string=None):
+        self.byte_array = bytes(byte_array)
+        self._ascii_string = ascii_string
+        self._hex_string = hex_string
+
+    @property
+    def ascii_string(self):
+        if self._ascii_string is None:
+            self._ascii_string = self.byte_array.decode('latin-1').translate(Text.ascii_table)
+        return self._ascii_string
+
+    @property
+    def hex_string(self):
+        if self._hex_string is None:
+            self._hex_string = self.byte_array.hex()
+        return self._hex_string
 
     @staticmethod
     def from_hex_string(hex_string):
-        byte_array = bytearray.fromhex(hex_string)
-        ascii_string = ''.join([chr(byte) if chr(byte).isprintable() else '·' for byte in byte_array])
-        return Text(ascii_string, byte_array, hex_string)
+        return Text(bytes.fromhex(hex_string), hex_string=hex_string)
 
     @staticmethod
     def from_ascii_string(ascii_string):
-        byte_array = [ord(char) for char in ascii_string]
-        hex_string = ''.join([format(byte, "02x") for byte in byte_array])
-        return Text(ascii_string, byte_array, hex_string)
+        return Text(ascii_string.encode('latin-1'), ascii_string=ascii_string)
 
     @staticmethod
     def from_byte_array(byte_array):
-        ascii_string = ''.join([chr(byte) if chr(byte).isprintable() else '·' for byte in byte_array])
-        hex_string = ''.join([format(byte, "02x") for byte in byte_array])
-        return Text(ascii_string, byte_array, hex_string)
+        return Text(byte_array)
+
+    # View of the bytes that can be sliced without copying
+    @property
+    def view(self):
+        return memoryview(self.byte_array)
 
     # Implementation of bitwise xoring of 2 texts using their numeric representation
     def xor(self, chyper_text):
-        return Text.from_byte_array(
-            [self.byte_array[i] ^ chyper_text.byte_array[i] for i in range(len(self.byte_array))])
+        return Text.from_byte_array(Text.xor_buffers(self.view, chyper_text.view))
+
+    # Xor two buffers over their shared length, treating each as one big integer so the whole buffer is done at once
+    @staticmethod
+    def xor_buffers(buffer1, buffer2):
+        length = min(len(buffer1), len(buffer2))
+        value = int.from_bytes(buffer1[:length], 'big') ^ int.from_bytes(buffer2[:length], 'big')
+        return value.to_bytes(length, 'big')
+
+
+# Text found by crib dragging, which remembers the offset in the xor text it was found at
+class CribDragResult(Text):
+    __slots__ = ('offset',)
+
+    def __init__(self, offset, byte_array):
+        super(CribDragResult, self).__init__(byte_array)
+        self.offset = offset
+
+
+# Crib dragging results for every offset of an xor text, looked up like a dictionary of offsets to results
+# Results are worked out when they are asked for rather than stored, so long xor texts don't need a result per offset
+# held in memory
+class CribDragResults(collections.abc.Mapping):
+    def __init__(self, xor_text, word):
+        self.xor_view = xor_text.view
+        self.length = len(word)
+        self.word_value = int.from_bytes(word.encode('latin-1'), 'big')
+        self.count = max(len(self.xor_view) - self.length + 1, 0)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __contains__(self, i):
+        return isinstance(i, int) and 0 <= i < self.count
+
+    def __getitem__(self, i):
+        if i not in self:
+            raise KeyError(i)
+        window_value = int.from_bytes(self.xor_view[i:i + self.length], 'big')
+        return CribDragResult(i, (self.word_value ^ window_value).to_bytes(self.length, 'big'))
+
+
+# Sorted list of words read straight out of a dictionary index, without loading them all into memory
+# Supports enough of a list to be binary searched
+class MappedWordList:
+    def __init__(self, section):
+        self.count = struct.unpack_from('<I', section)[0]
+        table_end = 4 + 4 * (self.count + 1)
+        self.starts = section[4:table_end].cast('I')
+        self.words = section[table_end:]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("word index out of range")
+        return str(self.words[self.starts[i]:self.starts[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def __contains__(self, word):
+        i = bisect.bisect_left(self, word)
+        return i < self.count and self[i] == word
+
+
+# Postings of each gram read out of a dictionary index, looked up like the dictionary of postings they replace
+class MappedPostings:
+    def __init__(self, grams, posting_starts, postings):
+        self.grams = grams
+        self.posting_starts = posting_starts
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.grams)
+
+    def __iter__(self):
+        return iter(self.grams)
+
+    def get(self, gram, default=None):
+        i = bisect.bisect_left(self.grams, gram)
+        if i == len(self.grams) or self.grams[i] != gram:
+            return default
+        return self.postings[self.posting_starts[i]:self.posting_starts[i + 1]]
 
 
 class Dictionary:
@@ -52,39 +171,221 @@ class Dictionary:
         ')|(' +\
         '|'.join([x + '\s*' for x in punctuation_with_trailing_spaces]) +\
         ')$)'
+    # Patterns are compiled once as they are used for every crib dragging offset
+    outer_punctuation_pattern = re.compile(outer_punctuation_regex)
+    inter_word_punctuation_pattern = re.compile(inter_word_punctuation_regex)
+    word_boundary_pattern = re.compile(word_boundary_characters)
+    # Every word is legal exactly when every character is either legal or a word boundary
+    legal_string_pattern = re.compile(r'[A-z0-9.\s/-]*')
+    # Characters that aren't legal, a word boundary, or punctuation that can be removed can never pass
+    illegal_character_pattern = re.compile(r'[^A-z0-9.\s/\-,?!()"\':;]')
+    # Length of the character grams used to index substrings of words
+    gram_length = 3
+    # Word checks that are cached, and the number of results each cache holds (None for no limit)
+    cached_checks = ['is_word', 'is_start_of_word', 'is_end_of_word', 'is_middle_of_word']
+    cache_size = 100000
+    # Prebuilt binary index of the words, used instead of the word list when it was built from it
+    # By default the index sits next to the word list with an .idx extension
+    index_extension = ".idx"
+    index_magic = b'CRIBDIC2'
+    # Magic, gram length, the size and modification time in nanoseconds of the word list the index was built from,
+    # then the positions of the 8 sections and the end of the file
+    index_header_format = '<8sIQq9Q'
 
-    def __init__(self):
-        self.english_words = open(self.path, 'r').read().splitlines()
+    def __init__(self, path=None, index_path=None, use_index=True):
+        if path is None:
+            path = self.path
+        if index_path is None:
+            index_path = self.default_index_path(path)
+        # Set when the indexes are read from a memory mapped index file
+        self.mapped_file = None
+        self.language_model_scores = None
+
+        if use_index and self.is_index_current(path, index_path):
+            self.load_index(index_path)
+        else:
+            self.load_words(open(path, 'r').read().splitlines())
+
+        # Put a bounded cache in front of each word check, as the same fragments come up over and over
+        for name in self.cached_checks:
+            setattr(self, name, functools.lru_cache(maxsize=self.cache_size)(getattr(self, name)))
+
+    # Hits, misses and size of the cache in front of each word check
+    def cache_info(self):
+        return {name: getattr(self, name).cache_info() for name in self.cached_checks}
+
+    def clear_caches(self):
+        for name in self.cached_checks:
+            getattr(self, name).cache_clear()
+
+    def load_words(self, english_words):
+        self.english_words = english_words
         self.word_count = len(self.english_words)
 
-        # Index the ranges for each start character in the alphabetical list to speed up searches
-        self.alphabetical_ranges = {}
-        current_start_character = self.english_words[0][0]
-        current_start_index = 0
-        for i in range(self.word_count):
-            word = self.english_words[i]
-            start_character = word[0].lower()
-            if start_character != current_start_character:
-                self.alphabetical_ranges[current_start_character] = (current_start_index, i)
-                current_start_index = i
-                current_start_character = start_character
-        self.alphabetical_ranges[current_start_character] = (current_start_index, self.word_count)
+        # Index the words so lookups don't have to scan the list
+        # A set answers exact matches, and a sorted copy can be binary searched for prefixes
+        self.word_set = set(self.english_words)
+        self.sorted_words = sorted(self.word_set)
+        # Reversing the words turns suffix searches into prefix searches
+        self.sorted_reversed_words = sorted(word[::-1] for word in self.word_set)
+
+        # Index which words contain each gram so substring searches only check words that could match
+        # Substrings shorter than a gram are few enough to store outright
+        self.short_substrings = set()
+        self.gram_postings = {}
+        for i in range(len(self.sorted_words)):
+            word = self.sorted_words[i]
+            grams = set()
+            for start in range(len(word)):
+                for length in range(1, self.gram_length):
+                    if start + length <= len(word):
+                        self.short_substrings.add(word[start:start + length])
+                if start + self.gram_length <= len(word):
+                    grams.add(word[start:start + self.gram_length])
+            for gram in grams:
+                if gram not in self.gram_postings:
+                    self.gram_postings[gram] = array('I')
+                self.gram_postings[gram].append(i)
+
+    @staticmethod
+    def default_index_path(path):
+        return os.path.splitext(path)[0] + Dictionary.index_extension
+
+    # Build the index file from the word list, including a language model trained on the words
+    @staticmethod
+    def build_index(path=None, index_path=None):
+        if path is None:
+            path = Dictionary.path
+        if index_path is None:
+            index_path = Dictionary.default_index_path(path)
+        dictionary = Dictionary(path, use_index=False)
+        dictionary.save_index(index_path, NGramModel.from_words(dictionary.english_words), path)
 
+    # The index file is only used if it was built from this word list, and the word list hasn't changed since
+    # An index can stand in for a word list that is missing, as long as it was built from a word list at that path
+    @staticmethod
+    def is_index_current(path, index_path):
+        source = Dictionary.read_index_source(index_path)
+        if source is None or source[0] != os.path.abspath(path):
+            return False
+        if not os.path.exists(path):
+            return True
+        stat = os.stat(path)
+        return source[1:] == (stat.st_size, stat.st_mtime_ns)
+
+    # The absolute path, size and modification time of the word list an index was built from, or None if there is no
+    # index at the path or it wasn't written in this format
+    @staticmethod
+    def read_index_source(index_path):
+        if not os.path.exists(index_path):
+            return None
+        header_size = struct.calcsize(Dictionary.index_header_format)
+        with open(index_path, 'rb') as index_file:
+            header_bytes = index_file.read(header_size)
+            if len(header_bytes) < header_size:
+                return None
+            header = struct.unpack(Dictionary.index_header_format, header_bytes)
+            if header[0] != Dictionary.index_magic or header[1] != Dictionary.gram_length:
+                return None
+            index_file.seek(header[11])
+            source_path = index_file.read(header[12] - header[11]).rstrip(b'\0').decode('utf-8')
+        return source_path, header[2], header[3]
+
+    # Write the indexes to a binary file that can be memory mapped instead of rebuilt
+    # The file is a header of where the word list came from and the section positions, followed by the sorted words,
+    # the sorted reversed words, the short substrings, the sorted grams, where each gram's postings start, the
+    # postings, optionally the scores of a language model, and the absolute path of the word list. Lists of words are
+    # stored as a count, a table of where each word starts, then the utf-8 words
+    def save_index(self, index_path, language_model=None, source_path=None):
+        source_size, source_mtime = 0, 0
+        if source_path is not None:
+            source_path = os.path.abspath(source_path)
+            stat = os.stat(source_path)
+            source_size, source_mtime = stat.st_size, stat.st_mtime_ns
+        grams = sorted(self.gram_postings)
+        posting_starts = array('I', [0])
+        postings = array('I')
+        for gram in grams:
+            postings.extend(self.gram_postings[gram])
+            posting_starts.append(len(postings))
+
+        sections = [
+            self.word_list_bytes(self.sorted_words),
+            self.word_list_bytes(self.sorted_reversed_words),
+            self.word_list_bytes(sorted(self.short_substrings)),
+            self.word_list_bytes(grams),
+            posting_starts.tobytes(),
+            postings.tobytes(),
+            language_model.log_probabilities.tobytes() if language_model is not None else b'',
+            source_path.encode('utf-8') if source_path is not None else b''
+        ]
+        header_size = struct.calcsize(self.index_header_format)
+        positions = []
+        position = header_size
+        for section in sections:
+            positions.append(position)
+            position += self.padded_length(len(section))
+        positions.append(position)
+
+        with open(index_path, 'wb') as index_file:
+            index_file.write(struct.pack(self.index_header_format, self.index_magic, self.gram_length, source_size,
+                                         source_mtime, *positions))
+            for section in sections:
+                index_file.write(section + bytes(self.padded_length(len(section)) - len(section)))
+
+    def load_index(self, index_path):
+        with open(index_path, 'rb') as index_file:
+            self.mapped_file = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = struct.unpack_from(self.index_header_format, self.mapped_file)
+        if header[0] != self.index_magic or header[1] != self.gram_length:
+            raise ValueError(index_path + " is not a dictionary index")
+        positions = header[4:]
+        view = memoryview(self.mapped_file)
+        sections = [view[positions[i]:positions[i + 1]] for i in range(len(positions) - 1)]
+
+        self.sorted_words = MappedWordList(sections[0])
+        self.sorted_reversed_words = MappedWordList(sections[1])
+        self.short_substrings = set(MappedWordList(sections[2]))
+        self.gram_postings = MappedPostings(MappedWordList(sections[3]), sections[4].cast('I'), sections[5].cast('I'))
+        if len(sections[6]) > 0:
+            self.language_model_scores = sections[6].cast('f')
+        self.english_words = self.sorted_words
+        self.word_set = self.sorted_words
+        self.word_count = len(self.sorted_words)
+
+    @staticmethod
+    def word_list_bytes(words):
+        encoded_words = [word.encode('utf-8') for word in words]
+        starts = array('I', [0])
+        for encoded_word in encoded_words:
+            starts.append(starts[-1] + len(encoded_word))
+        return struct.pack('<I', len(encoded_words)) + starts.tobytes() + b''.join(encoded_words)
+
+    # Sections are padded to multiples of 4 bytes so the number tables in them stay aligned
+    @staticmethod
+    def padded_length(length):
+        return (length + 3) // 4 * 4
+
+    # Takes a string, or bytes which are shown as they would be in a Text
     def is_english_subsring(self, string):
+        if not isinstance(string, str):
+            string = bytes(string).decode('latin-1').translate(Text.ascii_table)
         # Make string lowercase to match dictionary
         string = string.lower()
+        # Reject strings with characters that can't be part of a word before doing any more work
+        if self.illegal_character_pattern.search(string):
+            return False
         # Replace outer punctuation with spaces (separate because it may not have the usual leading/trailing spaces)
         # Leaving a space allows differentiating whole words vs parts of words at the start and end of the string
-        string = re.sub(self.outer_punctuation_regex, ' ', string)
+        string = self.outer_punctuation_pattern.sub(' ', string)
         # Replace inter-word punctuation with spaces (should always have the usual leading/trailing spaces)
-        string = re.sub(self.inter_word_punctuation_regex, ' ', string)
-        # Split at spaces (and other word boundaries)
-        words = re.split(self.word_boundary_characters, string)
+        string = self.inter_word_punctuation_pattern.sub(' ', string)
 
-        # If words still contains non alpha-numeric characters they will fail the dictionary match
-        for word in words:
-            if not re.fullmatch(self.legal_characters_regex, word):
-                return False
+        # If words would still contain non alpha-numeric characters they will fail the dictionary match
+        if not self.legal_string_pattern.fullmatch(string):
+            return False
+        # Split at spaces (and other word boundaries)
+        words = self.word_boundary_pattern.split(string)
 
         word_count = len(words)
         if word_count == 1:
@@ -103,51 +404,88 @@ class Dictionary:
                 if word != "" and not self.is_number(word) and not self.is_word(word):
                     return False
 
-            # end of word is slowest to search so do it last
             if first_word != "" and not self.is_number(first_word) and not self.is_end_of_word(first_word):
                 return False
         return True
 
     # Used to match words in the middle of a string
     def is_word(self, string):
-        start_char = string[0]
-        if start_char not in self.alphabetical_ranges:
-            return False
-        search_range = self.alphabetical_ranges[start_char]
-        for i in range(search_range[0], search_range[1]):
-            if string == self.english_words[i]:
-                return True
-        return False
+        return string in self.word_set
 
     # Used to match the last word in a string (end of word could be cut off)
     def is_start_of_word(self, string):
-        length = len(string)
-        start_char = string[0]
-        if start_char not in self.alphabetical_ranges:
-            return False
-        search_range = self.alphabetical_ranges[start_char]
-        for i in range(search_range[0], search_range[1]):
-            word = self.english_words[i]
-            if len(word) >= length and word[0:length] == string:
-                return True
-        return False
+        # Any word starting with string sorts directly at or after it
+        i = bisect.bisect_left(self.sorted_words, string)
+        return i < len(self.sorted_words) and self.sorted_words[i].startswith(string)
 
     # Used to match the first word in a string (start of word could be cut off)
     def is_end_of_word(self, string):
-        length = len(string)
-        for word in self.english_words:
-            word_length = len(word)
-            if word_length >= length and word[word_length - length:word_length] == string:
-                return True
-        return False
+        reversed_string = string[::-1]
+        i = bisect.bisect_left(self.sorted_reversed_words, reversed_string)
+        return i < len(self.sorted_reversed_words) and self.sorted_reversed_words[i].startswith(reversed_string)
 
     # Used to string that have only 1 word (start and/or end of word could be cut off)
     def is_middle_of_word(self, string):
-        for word in self.english_words:
-            if string in word:
+        if len(string) == 0:
+            return self.word_count > 0
+        if len(string) < self.gram_length:
+            return string in self.short_substrings
+
+        # Only words containing every gram of the string can contain the string, so check the rarest gram's words
+        candidates = None
+        for start in range(len(string) - self.gram_length + 1):
+            postings = self.gram_postings.get(string[start:start + self.gram_length])
+            if postings is None:
+                return False
+            if candidates is None or len(postings) < len(candidates):
+                candidates = postings
+        for i in candidates:
+            if string in self.sorted_words[i]:
                 return True
         return False
 
+    # Number of words that start with the string
+    def count_words_starting_with(self, string):
+        return self.count_prefixed(self.sorted_words, string)
+
+    # Number of words that end with the string
+    def count_words_ending_with(self, string):
+        return self.count_prefixed(self.sorted_reversed_words, string[::-1])
+
+    # Rough number of words that contain the string, counting the words that contain its rarest gram
+    def count_words_containing(self, string):
+        if len(string) < self.gram_length:
+            return self.word_count if string in self.short_substrings else 0
+        count = self.word_count
+        for start in range(len(string) - self.gram_length + 1):
+            count = min(count, len(self.gram_postings.get(string[start:start + self.gram_length], ())))
+        return count
+
+    # Words sharing a prefix sit together in a sorted list, so they can be counted from where the prefix's range starts
+    # and ends
+    @staticmethod
+    def count_prefixed(sorted_words, prefix):
+        start = bisect.bisect_left(sorted_words, prefix)
+        end = bisect.bisect_left(sorted_words, prefix + chr(sys.maxunicode))
+        return end - start
+
+    # Approximate memory used by each of the word indexes, in bytes
+    # A memory mapped index is shared between processes and only paged in as it is used, so its size is given instead
+    def index_memory_usage(self):
+        if self.mapped_file is not None:
+            return {"mapped_file": len(self.mapped_file)}
+        return {
+            "word_set": self.container_size(self.word_set),
+            "sorted_words": self.container_size(self.sorted_words),
+            "sorted_reversed_words": self.container_size(self.sorted_reversed_words),
+            "short_substrings": self.container_size(self.short_substrings),
+            "gram_postings": self.container_size(self.gram_postings) + self.container_size(self.gram_postings.values())
+        }
+
+    @staticmethod
+    def container_size(container):
+        return sys.getsizeof(container) + sum(sys.getsizeof(item) for item in container)
+
     # All words are checked against this separately as the dictionary only contains alphabetical words
     def is_number(self, string):
         try:
@@ -157,39 +495,631 @@ class Dictionary:
             return False
 
 
+# Scores how likely an xor of 2 ciphertexts is to be the xor of 2 english plaintexts, higher being more likely
+# Scorers work on batches of byte arrays so many pairs can be scored together
+class XorScorer(abc.ABC):
+    # Scores above this are considered promising
+    threshold = 0.5
+
+    def score(self, byte_array):
+        return self.score_batch([byte_array])[0]
+
+    @abc.abstractmethod
+    def score_batch(self, byte_arrays):
+        pass
+
+    def is_promising(self, score):
+        return score > self.threshold
+
+    # Indexes of the byte arrays ordered from most to least promising
+    def rank(self, byte_arrays):
+        scores = self.score_batch(byte_arrays)
+        return sorted(range(len(byte_arrays)), key=lambda i: -scores[i])
+
+
+# Scores by the proportion of bytes that fall in a set of byte values expected from plaintext xors
+class ByteClassXorScorer(XorScorer):
+    # 256 byte table, with 1 for byte values in the class and 0 for the rest
+    class_table = bytes(256)
+
+    # The whole batch is joined and translated through the class table at once, then each byte array's part is counted
+    def score_batch(self, byte_arrays):
+        marks = b''.join(byte_arrays).translate(self.class_table)
+        scores = []
+        start = 0
+        for byte_array in byte_arrays:
+            end = start + len(byte_array)
+            scores.append(marks.count(1, start, end) / len(byte_array) if end > start else 0)
+            start = end
+        return scores
+
+
+# Printable ascii characters all have their high bit clear, so their xors are always below 128
+class PrintableXorScorer(ByteClassXorScorer):
+    class_table = bytes(1 if byte < 0x80 else 0 for byte in range(256))
+
+    # Allowable proportion of bytes that couldn't come from printable characters
+    def __init__(self, auto_detection_ratio=0.1):
+        self.threshold = 1 - auto_detection_ratio
+
+
+# A space xored with a letter flips its 0x20 bit, giving the other case of the letter, while 2 letters of the same
+# case xor to below 0x20. English text is mostly letters and spaces, so most of its xor bytes fall in these ranges
+class SpaceXorLetterScorer(ByteClassXorScorer):
+    class_table = bytes(1 if byte < 0x20 or 0x41 <= byte <= 0x5a or 0x61 <= byte <= 0x7a else 0 for byte in range(256))
+    threshold = 0.6
+
+
+# Compares the histogram of the xor bytes with the distribution expected from xoring 2 random english characters
+class ChiSquaredXorScorer(XorScorer):
+    # Approximate frequencies of characters in english text
+    english_frequencies = {
+        ' ': 0.180, 'e': 0.102, 't': 0.075, 'a': 0.065, 'o': 0.062, 'i': 0.057, 'n': 0.057, 's': 0.053, 'r': 0.050,
+        'h': 0.050, 'l': 0.033, 'd': 0.033, 'u': 0.023, 'c': 0.022, 'm': 0.020, 'f': 0.018, 'w': 0.017, 'g': 0.016,
+        'y': 0.016, 'p': 0.015, 'b': 0.012, 'v': 0.008, 'k': 0.006, 'x': 0.001, 'j': 0.001, 'q': 0.001, 'z': 0.001,
+        'T': 0.003, 'I': 0.003, 'A': 0.002, 'S': 0.002, 'H': 0.001, 'W': 0.001, 'M': 0.001, 'B': 0.001, 'C': 0.001,
+        '.': 0.010, ',': 0.010, '\'': 0.002, '"': 0.002, '-': 0.002, '\n': 0.002
+    }
+    # Proportion of the expected distribution spread evenly over all bytes, so unexpected bytes aren't impossible
+    smoothing = 0.02
+    threshold = 0.1
+
+    def __init__(self):
+        total = sum(self.english_frequencies.values())
+        self.expected = [self.smoothing / 256] * 256
+        for char1, frequency1 in self.english_frequencies.items():
+            for char2, frequency2 in self.english_frequencies.items():
+                probability = (frequency1 / total) * (frequency2 / total)
+                self.expected[ord(char1) ^ ord(char2)] += (1 - self.smoothing) * probability
+        self.inverse_expected = [1 / expected for expected in self.expected]
+        self.expected_total = sum(self.expected)
+
+    # The statistic grows with the length for xors that don't fit, so it is divided by the length and mapped into
+    # 0 to 1 so scores for different lengths can be compared
+    # Expanding the square, the sum of (count - expected count) ** 2 / expected count over all 256 bytes is the sum of
+    # count ** 2 / expected count over the bytes that appear, less twice the length, plus the total expected count.
+    # So only the distinct bytes of each byte array are visited
+    def score_batch(self, byte_arrays):
+        inverse_expected = self.inverse_expected
+        scores = []
+        for byte_array in byte_arrays:
+            length = len(byte_array)
+            if length == 0:
+                scores.append(0)
+                continue
+            statistic = 0
+            for byte, count in collections.Counter(byte_array).items():
+                statistic += count * count * inverse_expected[byte]
+            statistic = statistic / length + length * (self.expected_total - 2)
+            scores.append(1 / (1 + statistic / length))
+        return scores
+
+
+# Character quadgram model of english, used to score how english a string looks
+# Each byte maps to a 5 bit symbol, so a quadgram packs into a 20 bit index into a flat array of scores. Each score is
+# the log probability of a quadgram's last symbol following the first 3, relative to picking symbols at random, so
+# english strings score above 0 and random ones below
+class NGramModel:
+    order = 4
+    symbol_bits = 5
+    symbol_count = 1 << symbol_bits
+    # Symbols for the characters that aren't letters
+    space_symbol = 26
+    digit_symbol = 27
+    punctuation_symbol = 28
+    other_symbol = 29
+    non_printable_symbol = 30
+    # Added to every quadgram count so unseen quadgrams aren't impossible
+    smoothing = 0.1
+
+    def __init__(self, text="", log_probabilities=None):
+        self.symbol_table = self.build_symbol_table()
+        self.index_mask = (1 << (self.symbol_bits * self.order)) - 1
+        # Scores can be given directly, such as ones mapped from a dictionary index
+        if log_probabilities is not None:
+            self.log_probabilities = log_probabilities
+            return
+
+        counts = collections.Counter(self.indexes(text.encode('latin-1', 'replace')))
+        context_totals = collections.Counter()
+        for index, count in counts.items():
+            context_totals[index >> self.symbol_bits] += count
+
+        # Turn counts into log probabilities of the last symbol given the first 3
+        # Unseen contexts are left at 0, which is what smoothing gives them
+        self.log_probabilities = array('f', [0]) * (1 << (self.symbol_bits * self.order))
+        uniform = math.log(1 / self.symbol_count)
+        for context, context_total in context_totals.items():
+            total = context_total + self.smoothing * self.symbol_count
+            start = context << self.symbol_bits
+            for index in range(start, start + self.symbol_count):
+                self.log_probabilities[index] = math.log((counts[index] + self.smoothing) / total) - uniform
+
+    # Train on the words of a dictionary, each separated by spaces
+    @staticmethod
+    def from_words(words):
+        return NGramModel(" " + " ".join(words) + " ")
+
+    def build_symbol_table(self):
+        table = bytearray(256)
+        for byte in range(256):
+            char = chr(byte)
+            if 'a' <= char.lower() <= 'z' and byte < 0x80:
+                table[byte] = ord(char.lower()) - ord('a')
+            elif char == ' ':
+                table[byte] = self.space_symbol
+            elif '0' <= char <= '9':
+                table[byte] = self.digit_symbol
+            elif char in '.,\'"-!?;:()':
+                table[byte] = self.punctuation_symbol
+            elif char.isprintable():
+                table[byte] = self.other_symbol
+            else:
+                table[byte] = self.non_printable_symbol
+        return bytes(table)
+
+    # Packed index of each quadgram in the bytes
+    def indexes(self, byte_array):
+        index = 0
+        symbols = bytes(byte_array).translate(self.symbol_table)
+        for i in range(len(symbols)):
+            index = ((index << self.symbol_bits) | symbols[i]) & self.index_mask
+            if i >= self.order - 1:
+                yield index
+
+    # Sum of the quadgram scores of a string or bytes
+    def score(self, string):
+        if isinstance(string, str):
+            string = string.encode('latin-1', 'replace')
+        log_probabilities = self.log_probabilities
+        score = 0
+        for index in self.indexes(string):
+            score += log_probabilities[index]
+        return score
+
+    # Mean of the quadgram scores, so strings of different lengths can be ranked together
+    # Strings too short to have a quadgram are padded with spaces, which mark word boundaries in the training text
+    def mean_score(self, string):
+        if isinstance(string, str):
+            string = string.encode('latin-1', 'replace')
+        if len(string) < self.order:
+            padding = b' ' * ((self.order - len(string) + 1) // 2)
+            string = padding + bytes(string) + padding
+        return self.score(string) / (len(string) - self.order + 1)
+
+
 class CribDraggingService:
-    # Allowable proportion of good characters vs bad in the evaluation methods below
-    auto_detection_ratio = 0.1
+    # Used to detect pairs of ciphertexts likely to share a key
+    pair_scorer = ChiSquaredXorScorer()
+    # Below this many pairs it is quicker to xor them all in this process than to start workers
+    parallel_pair_threshold = 50000
+    # Number of rows of the pair triangle handed to a worker at a time
+    pair_block_rows = 8
+    # Ciphertext bytes given to each worker process when it starts, so they aren't sent with every block
+    worker_byte_arrays = None
+    worker_values = None
+    worker_scorer = None
+
+    # Number of candidates kept at each step when extending results
+    extension_beam_width = 8
+    # Number of characters at the changed end of an extended string that are checked against the dictionary
+    extension_context = 24
+    # Characters tried when extending results
+    extension_characters = [chr(byte) for byte in range(0x20, 0x7f)]
+    extension_word_regex = re.compile('[A-Za-z]+|[^A-Za-z]+')
 
-    # Used to judge good crib dragging results
-    dictionary = Dictionary()
+    # Number of promising crib dragging results kept, best first, or None to keep them all
+    promising_result_limit = 100
+    # Number of offsets crib dragged between progress updates
+    crib_drag_chunk_size = 2048
+
+    # Used to judge good crib dragging results, loaded the first time it is needed
+    dictionary = None
+    # Word list and index the dictionary is loaded from, None for the Dictionary defaults
+    dictionary_path = None
+    dictionary_index_path = None
+    # Used to rank crib dragging results, built from the dictionary the first time it is needed
+    language_model = None
+    # Stops two threads loading the dictionary or language model at the same time
+    loading_lock = threading.Lock()
 
     # Takes in the xor of 2 ciphertexts and detects if it is likely they were generated by the same key
     @staticmethod
-    def is_likely_plaintext_xor(xor_text):
-        bad_bytes = 0
-        max_bad_bytes = math.ceil(CribDraggingService.auto_detection_ratio * len(xor_text.byte_array))
+    def is_likely_plaintext_xor(xor_text, scorer=None):
+        if scorer is None:
+            scorer = CribDraggingService.pair_scorer
+        return scorer.is_promising(scorer.score(xor_text.byte_array))
 
-        for byte in xor_text.byte_array:
-            if byte > 127:
-                bad_bytes += 1
-                if bad_bytes >= max_bad_bytes:
-                    break
-        if bad_bytes < max_bad_bytes:
-            return True
-        return False
+    # Xor every pair of byte arrays, returning (i, j, xor bytes, score) in pair order
+    # Large sets are split into blocks of rows and spread over a pool of worker processes
+    @staticmethod
+    def xor_all_pairs(byte_arrays, scorer=None, workers=None):
+        if scorer is None:
+            scorer = CribDraggingService.pair_scorer
+        count = len(byte_arrays)
+        pair_count = count * (count - 1) // 2
+        blocks = [(start, min(start + CribDraggingService.pair_block_rows, count))
+                  for start in range(0, count, CribDraggingService.pair_block_rows)]
+
+        if workers == 1 or pair_count < CribDraggingService.parallel_pair_threshold:
+            CribDraggingService.set_worker_byte_arrays(byte_arrays, scorer)
+            block_results = [CribDraggingService.xor_pair_block(block) for block in blocks]
+            CribDraggingService.set_worker_byte_arrays(None, None)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=CribDraggingService.set_worker_byte_arrays,
+                    initargs=([bytes(byte_array) for byte_array in byte_arrays], scorer)) as executor:
+                block_results = list(executor.map(CribDraggingService.xor_pair_block, blocks))
+
+        results = []
+        for block_result in block_results:
+            results.extend(block_result)
+        return results
+
+    # Xor and score a single pair
+    @staticmethod
+    def xor_pair(byte_array1, byte_array2, scorer=None):
+        if scorer is None:
+            scorer = CribDraggingService.pair_scorer
+        xor_bytes = Text.xor_buffers(byte_array1, byte_array2)
+        return xor_bytes, scorer.score(xor_bytes)
+
+    @staticmethod
+    def set_worker_byte_arrays(byte_arrays, scorer):
+        CribDraggingService.worker_byte_arrays = byte_arrays
+        CribDraggingService.worker_scorer = scorer
+        CribDraggingService.worker_values = None
+        if byte_arrays is not None:
+            CribDraggingService.worker_values = [int.from_bytes(byte_array, 'big') for byte_array in byte_arrays]
+
+    # Xor each row in the block against every later byte array, then score the block's xors in one batch
+    # Each byte array is turned into one big integer, so a pair is a single integer xor
+    @staticmethod
+    def xor_pair_block(block):
+        byte_arrays = CribDraggingService.worker_byte_arrays
+        values = CribDraggingService.worker_values
+        roots = []
+        xors = []
+        for i in range(block[0], block[1]):
+            for j in range(i + 1, len(byte_arrays)):
+                length = min(len(byte_arrays[i]), len(byte_arrays[j]))
+                # Drop the trailing bytes of the longer array so both cover the shared length
+                value = ((values[i] >> (8 * (len(byte_arrays[i]) - length))) ^
+                         (values[j] >> (8 * (len(byte_arrays[j]) - length))))
+                roots.append((i, j))
+                xors.append(value.to_bytes(length, 'big'))
+        scores = CribDraggingService.worker_scorer.score_batch(xors)
+        return [(roots[k][0], roots[k][1], xors[k], scores[k]) for k in range(len(xors))]
 
     # Get all possible corresponding strings for a given word, based on an xor text
+    # All results are worked out as they are looked up, and only the best promising results are kept while searching
     @staticmethod
     def crib_drag(xor_text, word):
-        all_results = {}
+        all_results = CribDragResults(xor_text, word)
         promising_results = {}
+        for i, result in CribDraggingService.best_results(
+                CribDraggingService.crib_drag_stream(xor_text, word), CribDraggingService.promising_result_limit):
+            promising_results[i] = result
+        return all_results, promising_results
+
+    # Yield (offset, result) for each result that passes the dictionary check, in offset order as they are found
+    @staticmethod
+    def crib_drag_stream(xor_text, word):
+        for progress, candidates in CribDraggingService.crib_drag_chunks(xor_text, word):
+            yield from candidates
+
+    # Crib drag a chunk of offsets at a time, yielding (progress from 0 to 1, the chunk's (offset, result) pairs that
+    # pass the dictionary check) so a long search can report progress or be stopped
+    # Only one chunk is worked on at a time, so memory use doesn't grow with the length of the xor text
+    @staticmethod
+    def crib_drag_chunks(xor_text, word, chunk_size=None):
+        if chunk_size is None:
+            chunk_size = CribDraggingService.crib_drag_chunk_size
         length = len(word)
         word = Text.from_ascii_string(word)
-        for i in range(len(xor_text.ascii_string) - length + 1):
-            sub_string = Text.from_byte_array(xor_text.byte_array[i:i + length])
-            result = word.xor(sub_string)
-            all_results[i] = result
-            if CribDraggingService.dictionary.is_english_subsring(result.ascii_string):
-                promising_results[i] = result
-        return all_results, promising_results
+        # Windows are taken from a memoryview so they aren't copied, and the word only needs converting once
+        xor_view = xor_text.view
+        word_value = int.from_bytes(word.byte_array, 'big')
+        offset_count = len(xor_view) - length + 1
+        dictionary = CribDraggingService.get_dictionary()
+
+        for start in range(0, max(offset_count, 0), chunk_size):
+            end = min(start + chunk_size, offset_count)
+            candidates = []
+            # Only results made entirely of printable characters can pass the dictionary check
+            chunk_bytes = bytes(xor_view[start:end + length - 1])
+            for i in CribDraggingService.printable_offsets(chunk_bytes, word.byte_array):
+                window_value = int.from_bytes(xor_view[start + i:start + i + length], 'big')
+                result = CribDragResult(start + i, (word_value ^ window_value).to_bytes(length, 'big'))
+                if dictionary.is_english_subsring(result.ascii_string):
+                    candidates.append((start + i, result))
+            yield end / offset_count, candidates
+
+    @staticmethod
+    def get_dictionary():
+        with CribDraggingService.loading_lock:
+            if CribDraggingService.dictionary is None:
+                CribDraggingService.dictionary = Dictionary(
+                    CribDraggingService.dictionary_path, CribDraggingService.dictionary_index_path)
+            return CribDraggingService.dictionary
+
+    @staticmethod
+    def get_language_model():
+        dictionary = CribDraggingService.get_dictionary()
+        with CribDraggingService.loading_lock:
+            if CribDraggingService.language_model is None:
+                if dictionary.language_model_scores is not None:
+                    CribDraggingService.language_model = NGramModel(log_probabilities=dictionary.language_model_scores)
+                else:
+                    CribDraggingService.language_model = NGramModel.from_words(dictionary.english_words)
+            return CribDraggingService.language_model
+
+    # Load the dictionary and language model on a background thread, so they are ready by the time they are needed
+    # If loading fails, the error is raised again when they are first used
+    @staticmethod
+    def warm_up():
+        def load():
+            try:
+                CribDraggingService.get_language_model()
+            except (OSError, ValueError):
+                pass
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    # Order results by how english they look, best first, keeping at most limit of them using a heap
+    # Each result is a tuple ending with its Text, scored by its mean quadgram score unless another key is given.
+    # Results can be any iterable, and when there is a limit only that many are held at once, along with any that
+    # score the same as the worst of them. Which of a tie to keep would be arbitrary, so none of them are dropped
+    @staticmethod
+    def best_results(results, limit=None, key=None):
+        if key is None:
+            language_model = CribDraggingService.get_language_model()
+            key = lambda result: language_model.mean_score(result[-1].byte_array)
+        if limit is None:
+            return sorted(results, key=key, reverse=True)
+        # Entries are (score, -position, result), so among equal scores the earlier result ranks first
+        heap = []
+        ties = []
+        for position, result in enumerate(results):
+            entry = (key(result), -position, result)
+            if len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                removed = heapq.heapreplace(heap, entry)
+                if removed[0] == heap[0][0]:
+                    ties.append(removed)
+                else:
+                    ties = []
+            elif entry[0] == heap[0][0]:
+                ties.append(entry)
+        entries = heap + ties
+        entries.sort(key=lambda entry: entry[:2], reverse=True)
+        return [entry[2] for entry in entries]
+
+    # Get the promising strings for a list of words, as (word, offset, result) ranked across all the words
+    # Words of the same length are dragged together in a single sweep over the xor text, so each window is only
+    # converted once however many words are being tried
+    @staticmethod
+    def crib_drag_words(xor_text, words, limit=None):
+        words_by_length = {}
+        for word in words:
+            if word not in words_by_length.setdefault(len(word), []):
+                words_by_length[len(word)].append(word)
+
+        results = []
+        xor_view = xor_text.view
+        dictionary = CribDraggingService.get_dictionary()
+        for length, length_words in words_by_length.items():
+            # Each word only needs trying at the offsets where it gives printable results
+            offset_words = {}
+            for word in length_words:
+                word = Text.from_ascii_string(word)
+                word_value = int.from_bytes(word.byte_array, 'big')
+                for i in CribDraggingService.printable_offsets(xor_text.byte_array, word.byte_array):
+                    offset_words.setdefault(i, []).append((word, word_value))
+
+            for i in sorted(offset_words):
+                window_value = int.from_bytes(xor_view[i:i + length], 'big')
+                for word, word_value in offset_words[i]:
+                    result = Text.from_byte_array((word_value ^ window_value).to_bytes(length, 'big'))
+                    if dictionary.is_english_subsring(result.ascii_string):
+                        results.append((word.ascii_string, i, result))
+
+        return CribDraggingService.best_results(results, limit)
+
+    # Crib drag a word against every ciphertext at once, for ciphertexts that all share a keystream
+    # Placing the word in one ciphertext at an offset gives the keystream there, and so the plaintext of every other
+    # ciphertext at that offset. Returns (text index, offset, plaintexts) ranked by how english the plaintexts look,
+    # best first, where plaintexts has a Text for each ciphertext, or None where it is too short to reach the offset
+    @staticmethod
+    def crib_drag_texts(cipher_texts, word, limit=None):
+        word_bytes = word.encode('latin-1')
+        length = len(word_bytes)
+        candidates = []
+        for t in range(len(cipher_texts)):
+            cipher_view = cipher_texts[t].view
+            offset_count = len(cipher_view) - length + 1
+            if offset_count < 1:
+                continue
+            # The printable masks of the word against every other ciphertext are and-ed together, so one integer
+            # operation per ciphertext finds the offsets where all of their plaintexts would be printable
+            valid = int.from_bytes(b'\x01' * offset_count, 'little')
+            for u in range(len(cipher_texts)):
+                if u == t:
+                    continue
+                xor_bytes = Text.xor_buffers(cipher_view, cipher_texts[u].view)
+                covered = max(len(xor_bytes) - length + 1, 0)
+                # Offsets past the end of the other ciphertext don't rule anything out
+                uncovered = int.from_bytes(b'\x00' * covered + b'\x01' * (offset_count - covered), 'little')
+                valid &= CribDraggingService.printable_mask(xor_bytes, word_bytes) | uncovered
+
+            for k in CribDraggingService.mask_offsets(valid, offset_count):
+                keystream = Text.xor_buffers(cipher_view[k:k + length], word_bytes)
+                plaintexts = []
+                for cipher_text in cipher_texts:
+                    if len(cipher_text.byte_array) < k + length:
+                        plaintexts.append(None)
+                    else:
+                        plaintexts.append(Text.from_byte_array(
+                            Text.xor_buffers(cipher_text.view[k:k + length], keystream)))
+                candidates.append((t, k, plaintexts))
+
+        return CribDraggingService.best_results(
+            candidates, limit, lambda candidate: CribDraggingService.plaintexts_score(candidate[0], candidate[2]))
+
+    # Total mean language model score of the plaintexts the crib gave in the other ciphertexts, so offsets that reach
+    # more of the ciphertexts count for more. The plaintext of ciphertext t is the crib itself, so it isn't counted
+    @staticmethod
+    def plaintexts_score(t, plaintexts):
+        language_model = CribDraggingService.get_language_model()
+        score = 0
+        for u in range(len(plaintexts)):
+            if u != t and plaintexts[u] is not None:
+                score += language_model.mean_score(plaintexts[u].byte_array)
+        return score
+
+    # Grow a pair of matching strings found at index outwards one character at a time, keeping the extensions where
+    # both strings still look like english. A beam of the best scoring candidates is kept at each step, and the longest
+    # pair reached is returned as (start index, string1, string2)
+    # fixed_characters maps indexes to characters string1 must have there, or None where it can't be extended
+    @staticmethod
+    def extend_result(xor_text, index, string1, string2, fixed_characters=None, beam_width=None, max_steps=None):
+        best = None
+        for progress, best in CribDraggingService.extend_result_steps(
+                xor_text, index, string1, string2, fixed_characters, beam_width, max_steps):
+            pass
+        return best
+
+    # Extend a result as extend_result does, yielding (progress from 0 to 1, best pair so far) after every step so a
+    # caller can show how far it has got or stop early. The last pair yielded is the one extend_result returns
+    @staticmethod
+    def extend_result_steps(xor_text, index, string1, string2, fixed_characters=None, beam_width=None,
+                            max_steps=None):
+        if fixed_characters is None:
+            fixed_characters = {}
+        if beam_width is None:
+            beam_width = CribDraggingService.extension_beam_width
+        if max_steps is None:
+            max_steps = len(xor_text.byte_array)
+        dictionary = CribDraggingService.get_dictionary()
+        context = CribDraggingService.extension_context
+
+        beam = [(0, index, string1, string2)]
+        for step in range(max_steps):
+            candidates = {}
+            for score, start, current1, current2 in beam:
+                end = start + len(current1)
+                for position in (start - 1, end):
+                    if position < 0 or position >= len(xor_text.byte_array):
+                        continue
+                    if position in fixed_characters:
+                        if fixed_characters[position] is None:
+                            continue
+                        characters = [fixed_characters[position]]
+                    else:
+                        characters = CribDraggingService.extension_characters
+
+                    for char1 in characters:
+                        char2 = chr(ord(char1) ^ xor_text.byte_array[position])
+                        if not 0x20 <= ord(char2) < 0x7f:
+                            continue
+                        # The rest of the strings were checked on earlier steps, so only the end that changed is checked
+                        if position < start:
+                            new_start = position
+                            new1 = char1 + current1
+                            new2 = char2 + current2
+                            check1 = new1[:context]
+                            check2 = new2[:context]
+                        else:
+                            new_start = start
+                            new1 = current1 + char1
+                            new2 = current2 + char2
+                            check1 = new1[-context:]
+                            check2 = new2[-context:]
+                        if (new_start, new1) in candidates:
+                            continue
+                        if dictionary.is_english_subsring(check1) and dictionary.is_english_subsring(check2):
+                            new_score = (CribDraggingService.extension_score(new1) +
+                                         CribDraggingService.extension_score(new2))
+                            candidates[(new_start, new1)] = (new_score, new_start, new1, new2)
+            if len(candidates) == 0:
+                break
+            beam = sorted(candidates.values(), key=lambda candidate: -candidate[0])[:beam_width]
+            best = beam[0]
+            yield (step + 1) / max_steps, (best[1], best[2], best[3])
+
+        best = beam[0]
+        yield 1, (best[1], best[2], best[3])
+
+    # Score how english a string looks. On top of the language model, whole dictionary words in the middle score by
+    # their length, the cut off words at either end score by how many dictionary words they could be part of, and
+    # other characters cost by how rare they are in english
+    @staticmethod
+    def extension_score(string):
+        dictionary = CribDraggingService.get_dictionary()
+        frequencies = ChiSquaredXorScorer.english_frequencies
+        score = CribDraggingService.get_language_model().score(string)
+        tokens = CribDraggingService.extension_word_regex.findall(string)
+        for i in range(len(tokens)):
+            token = tokens[i]
+            if not token.isalpha():
+                for char in token:
+                    score += math.log(frequencies.get(char, 0) + 0.001)
+                continue
+            word = token.lower()
+            if i == 0 and i == len(tokens) - 1:
+                score += math.log(1 + dictionary.count_words_containing(word))
+            elif i == 0:
+                score += math.log(1 + dictionary.count_words_ending_with(word))
+            elif i == len(tokens) - 1:
+                score += math.log(1 + dictionary.count_words_starting_with(word))
+            elif dictionary.is_word(word):
+                score += len(word) ** 1.5
+            # Capitals are only expected at the start of words
+            for char in token[1:]:
+                if char.isupper():
+                    score -= 2
+        return score
+
+    # Find every offset where xoring the word against the xor text gives only printable ascii characters
+    @staticmethod
+    def printable_offsets(xor_byte_array, word_byte_array):
+        offset_count = len(xor_byte_array) - len(word_byte_array) + 1
+        if offset_count < 1:
+            return []
+        return CribDraggingService.mask_offsets(
+            CribDraggingService.printable_mask(xor_byte_array, word_byte_array), offset_count)
+
+    # Mark the offsets where xoring the word against the xor text gives only printable ascii characters, as one big
+    # integer with a little-endian byte per offset that is 1 where the result is printable
+    # Each word byte has a lookup table marking which xor bytes it turns printable, and the xor text is translated
+    # through it in one go. The marks are packed into one big integer per table, one byte per offset, so shifting
+    # and and-ing the integers checks every offset at once instead of looping over the text in Python
+    @staticmethod
+    def printable_mask(xor_byte_array, word_byte_array):
+        offset_count = len(xor_byte_array) - len(word_byte_array) + 1
+        if offset_count < 1:
+            return 0
+
+        masks = {}
+        valid = int.from_bytes(b'\x01' * offset_count, 'little')
+        for j in range(len(word_byte_array)):
+            word_byte = word_byte_array[j]
+            if word_byte not in masks:
+                table = bytes(1 if 0x20 <= byte ^ word_byte < 0x7f else 0 for byte in range(256))
+                masks[word_byte] = int.from_bytes(xor_byte_array.translate(table), 'little')
+            valid &= masks[word_byte] >> (8 * j)
+        return valid
+
+    # Offsets marked in a mask made by printable_mask
+    @staticmethod
+    def mask_offsets(mask, offset_count):
+        mask_bytes = mask.to_bytes(offset_count, 'little')
+        offsets = []
+        i = mask_bytes.find(1)
+        while i != -1:
+            offsets.append(i)
+            i = mask_bytes.find(1, i + 1)
+        return offsets
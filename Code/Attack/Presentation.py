@@ -1,7 +1,7 @@
 from CustomControls import *
-from Domain import Text
 import tkinter
 from tkinter import filedialog
+from tkinter import ttk
 
 
 class LoadCipherTextsScreen(tkinter.Frame):
@@ -51,11 +51,12 @@ class LoadCipherTextsScreen(tkinter.Frame):
             self.label['text'] = self.application_model.path
             self.cipher_text_display.update(self.application_model.cipher_texts)
 
+    def on_leave(self):
+        pass
+
     def load_file(self):
         path = filedialog.askopenfilename(filetypes=(("Text files", "*.txt"), ("All files", "*.*")))
-        cipher_texts = [Text.from_hex_string(hex_string) for hex_string in open(path, 'r').read().splitlines()]
-        self.application_model.path = path
-        self.application_model.cipher_texts = cipher_texts
+        self.application_model.load_cipher_texts(path)
         self.label['text'] = self.application_model.path
         self.detail_bar['text'] = self.build_detail_bar_text()
         self.cipher_text_display.update(self.application_model.cipher_texts)
@@ -98,7 +99,16 @@ class PairSelectionScreen(tkinter.Frame):
         self.label = tkinter.Label(self)
         self.label['anchor'] = "e"
         self.label['font'] = ("Segoe UI", 10)
-        self.label.grid(row=2, column=1, columnspan=2, sticky='w', padx=(8, 0), pady=(8, 0))
+        self.label.grid(row=2, column=1, sticky='w', padx=(8, 0), pady=(8, 0))
+
+        # Sharing the keystream between pairs is only right when every ciphertext was encrypted with the same key
+        self.shared_keystream_variable = tkinter.BooleanVar()
+        self.shared_keystream_button = tkinter.Checkbutton(self)
+        self.shared_keystream_button['text'] = "All ciphertexts share one keystream"
+        self.shared_keystream_button['font'] = ("Segoe UI", 9)
+        self.shared_keystream_button['variable'] = self.shared_keystream_variable
+        self.shared_keystream_button['command'] = self.on_shared_keystream_changed
+        self.shared_keystream_button.grid(row=2, column=2, sticky='e', pady=(8, 0))
 
         self.detail_bar = tkinter.Label(self)
         self.detail_bar['text'] = "No pair selected"
@@ -111,8 +121,15 @@ class PairSelectionScreen(tkinter.Frame):
 
     def on_enter(self):
         self.application_model.calculate_pairs()
+        self.shared_keystream_variable.set(self.application_model.shared_keystream)
         self.show_promising_pairs()
 
+    def on_shared_keystream_changed(self):
+        self.application_model.shared_keystream = self.shared_keystream_variable.get()
+
+    def on_leave(self):
+        pass
+
     def on_selection_changed(self, value):
         self.application_model.selected_pair = value
         self.detail_bar['text'] = self.build_detail_bar_text()
@@ -144,7 +161,12 @@ class PairSelectionScreen(tkinter.Frame):
 class CribDraggingScreen(tkinter.Frame):
 
     max_characters_per_row = 50
+    # Only this many rows of entry boxes are made, and they are reused to show one page of the strings at a time
+    rows_per_page = 4
+    characters_per_page = max_characters_per_row * rows_per_page
     selected_colour = "DodgerBlue2"
+    # Milliseconds between checks for results from a running crib drag
+    poll_interval = 50
 
     def __init__(self, application, application_model, navigation_model):
         super(CribDraggingScreen, self).__init__(application)
@@ -152,7 +174,13 @@ class CribDraggingScreen(tkinter.Frame):
         self.application_model = application_model
         self.crib_dragging_mode_model = None
         self.entry_boxes_list = []
+        # Index of the first character shown in the entry boxes
+        self.page_start = 0
+        # Set while the entry boxes are being filled in from the model, so their change events are ignored
+        self.loading_page = False
         self.showing_all = False
+        self.poll_job = None
+        self.extension_poll_job = None
         self.rowconfigure(2, weight=1)
         self.columnconfigure(1, weight=1)
 
@@ -174,11 +202,26 @@ class CribDraggingScreen(tkinter.Frame):
 
         self.entry = tkinter.Entry(self)
         self.entry['font'] = ("Segoe UI", 10)
-        self.entry.grid(row=1, column=1, columnspan=2, sticky="nesw")
+        self.entry.grid(row=1, column=1, sticky="nesw")
+
+        search_controls = tkinter.Frame(self)
+        search_controls.grid(row=1, column=2, sticky="e")
+
+        self.progress_bar = ttk.Progressbar(search_controls)
+        self.progress_bar['length'] = 120
+        self.progress_bar['maximum'] = 100
+        self.progress_bar.pack(side=tkinter.LEFT, padx=(8, 0))
+
+        self.cancel_button = tkinter.Button(search_controls)
+        self.cancel_button['text'] = "Cancel"
+        self.cancel_button['font'] = ("Segoe UI", 9)
+        self.cancel_button['command'] = self.cancel
+        self.cancel_button['state'] = "disabled"
+        self.cancel_button.pack(side=tkinter.LEFT, padx=(8, 0))
 
         self.words_box = CipherTextDisplay(self)
         self.words_box.grid(row=2, column=0, columnspan=3, sticky='nesw', pady=(8, 0))
-        self.words_box.bind_selection_changed(self.on_selection_changed)
+        self.words_box.bind_selection_changed(self.on_result_picked)
 
         self.toggle_button = tkinter.Button(self)
         self.toggle_button['font'] = ("Segoe UI", 9)
@@ -193,16 +236,57 @@ class CribDraggingScreen(tkinter.Frame):
         self.label['font'] = ("Segoe UI", 10)
         self.label.grid(row=3, column=1, sticky='w', pady=(8, 0))
 
-        self.apply_button = tkinter.Button(self)
+        selection_buttons = tkinter.Frame(self)
+        selection_buttons.grid(row=3, column=2, sticky="e", pady=(8, 0))
+
+        # Crib dragging can't tell which plaintext of the pair the crib is in, so the user picks the ciphertext
+        self.crib_in_string2_variable = tkinter.BooleanVar()
+        self.crib_buttons = []
+        for value in (False, True):
+            crib_button = tkinter.Radiobutton(selection_buttons)
+            crib_button['variable'] = self.crib_in_string2_variable
+            crib_button['value'] = value
+            crib_button['font'] = ("Segoe UI", 9)
+            crib_button['command'] = self.on_crib_string_changed
+            crib_button.pack(side=tkinter.LEFT, padx=(0, 8))
+            self.crib_buttons.append(crib_button)
+
+        self.extend_button = tkinter.Button(selection_buttons)
+        self.extend_button['text'] = "Auto extend ↓"
+        self.extend_button['font'] = ("Segoe UI", 9)
+        self.extend_button['command'] = self.extend_selection
+        self.extend_button['state'] = "disabled"
+        self.extend_button.pack(side=tkinter.LEFT)
+
+        self.apply_button = tkinter.Button(selection_buttons)
         self.apply_button['text'] = "Apply selection ↓"
         self.apply_button['font'] = ("Segoe UI", 9)
         self.apply_button['command'] = self.apply_selection
         self.apply_button['state'] = "disabled"
-        self.apply_button.grid(row=3, column=2, sticky="e", pady=(8, 0))
+        self.apply_button.pack(side=tkinter.LEFT, padx=(8, 0))
 
         self.entry_boxes_container = tkinter.Frame(self)
         self.entry_boxes_container.grid(row=4, column=0, columnspan=3)
 
+        page_controls = tkinter.Frame(self.entry_boxes_container)
+        page_controls.grid(row=self.rows_per_page, column=0, columnspan=self.max_characters_per_row, pady=(8, 0))
+
+        self.previous_page_button = tkinter.Button(page_controls)
+        self.previous_page_button['text'] = "← Previous"
+        self.previous_page_button['font'] = ("Segoe UI", 9)
+        self.previous_page_button['command'] = lambda: self.change_page(self.page_start - self.characters_per_page)
+        self.previous_page_button.pack(side=tkinter.LEFT)
+
+        self.page_label = tkinter.Label(page_controls)
+        self.page_label['font'] = ("Segoe UI", 9)
+        self.page_label.pack(side=tkinter.LEFT, padx=(8, 0))
+
+        self.next_page_button = tkinter.Button(page_controls)
+        self.next_page_button['text'] = "Next →"
+        self.next_page_button['font'] = ("Segoe UI", 9)
+        self.next_page_button['command'] = lambda: self.change_page(self.page_start + self.characters_per_page)
+        self.next_page_button.pack(side=tkinter.LEFT, padx=(8, 0))
+
         self.detail_bar = tkinter.Label(self)
         self.detail_bar['text'] = "No pair selected"
         self.detail_bar['font'] = ("Segoe UI", 9, "italic")
@@ -214,22 +298,131 @@ class CribDraggingScreen(tkinter.Frame):
 
     def on_enter(self):
         self.apply_button['state'] = "disabled"
+        self.extend_button['state'] = "disabled"
         self.toggle_button['state'] = "disabled"
+        if self.crib_dragging_mode_model is not None:
+            self.cancel()
+            # The entry boxes are kept for the new pair, so the old selection's highlight has to be taken off them
+            self.on_selection_changed(None)
+        self.progress_bar['value'] = 0
         self.crib_dragging_mode_model = self.application_model.build_crib_dragging_model()
+        roots = self.crib_dragging_mode_model.roots
+        for i in range(len(self.crib_buttons)):
+            self.crib_buttons[i]['text'] = "Crib in " + str(roots[i] + 1)
+        self.crib_in_string2_variable.set(self.crib_dragging_mode_model.crib_in_string2)
         self.words_box.update([])
         self.build_entry_boxes()
         self.detail_bar['text'] = self.build_detail_bar_text()
 
+    # A search left running would keep polling while the screen is hidden
+    def on_leave(self):
+        if self.crib_dragging_mode_model is not None:
+            self.cancel()
+
+    # The search runs in the background, with its results picked up by polling so the window stays responsive
     def set_crib_dragging_word(self, word):
         self.on_selection_changed(None)
-        self.crib_dragging_mode_model.set_crib_dragging_word(word)
+        try:
+            self.crib_dragging_mode_model.start_crib_dragging_word(word)
+        except UnicodeEncodeError:
+            self.detail_bar['text'] = self.build_detail_bar_text() + ".   Cribs can only use latin-1 characters"
+            return
         self.toggle_button['state'] = "normal"
+        self.cancel_button['state'] = "normal"
+        self.progress_bar['value'] = 0
         self.refresh_word_box()
         self.detail_bar['text'] = self.build_detail_bar_text()
+        self.schedule_poll()
+
+    def schedule_poll(self):
+        if self.poll_job is not None:
+            self.after_cancel(self.poll_job)
+        self.poll_job = self.after(self.poll_interval, self.poll_crib_dragging)
+
+    def poll_crib_dragging(self):
+        self.poll_job = None
+        progress, done, changed = self.crib_dragging_mode_model.poll_crib_dragging()
+        self.progress_bar['value'] = progress * 100
+        if done:
+            self.finish_crib_dragging()
+            return
+        # All results are only shown once the search stops, as there can be too many to redraw on every poll
+        # Promising results are only redrawn when the poll brought new ones
+        if changed and not self.showing_all:
+            self.show_promising_words()
+        self.schedule_poll()
+
+    # Stops both the crib dragging search and any extension
+    def cancel(self):
+        self.cancel_extending()
+        self.cancel_crib_dragging()
+
+    def cancel_crib_dragging(self):
+        self.crib_dragging_mode_model.cancel_crib_dragging()
+        if self.poll_job is not None:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.finish_crib_dragging()
+
+    def finish_crib_dragging(self):
+        if not self.crib_dragging_mode_model.is_extending():
+            self.cancel_button['state'] = "disabled"
+        self.refresh_word_box()
+        error = self.crib_dragging_mode_model.crib_dragging_error
+        if error is not None:
+            self.label['text'] = "Crib dragging failed: " + str(error)
+
+    def on_crib_string_changed(self):
+        self.crib_dragging_mode_model.set_crib_in_string2(self.crib_in_string2_variable.get())
 
     def apply_selection(self):
         self.crib_dragging_mode_model.apply_selected_result()
-        self.update_all_entry_boxes()
+        self.update_changed_entry_boxes()
+
+    # Extending can take seconds on long texts, so it runs in the background and is polled like crib dragging
+    # The progress bar shows the extension unless a search is using it
+    def extend_selection(self):
+        self.crib_dragging_mode_model.start_extending_selected_result()
+        self.extend_button['state'] = "disabled"
+        self.cancel_button['state'] = "normal"
+        if not self.crib_dragging_mode_model.is_crib_dragging():
+            self.progress_bar['value'] = 0
+        self.label['text'] = "Extending the selected result"
+        self.schedule_extension_poll()
+
+    def schedule_extension_poll(self):
+        if self.extension_poll_job is not None:
+            self.after_cancel(self.extension_poll_job)
+        self.extension_poll_job = self.after(self.poll_interval, self.poll_extension)
+
+    def poll_extension(self):
+        self.extension_poll_job = None
+        progress, done = self.crib_dragging_mode_model.poll_extension()
+        if not self.crib_dragging_mode_model.is_crib_dragging():
+            self.progress_bar['value'] = progress * 100
+        if done:
+            self.finish_extending()
+            return
+        self.schedule_extension_poll()
+
+    def cancel_extending(self):
+        self.crib_dragging_mode_model.cancel_extending()
+        if self.extension_poll_job is not None:
+            self.after_cancel(self.extension_poll_job)
+            self.extension_poll_job = None
+        self.finish_extending()
+
+    def finish_extending(self):
+        if not self.crib_dragging_mode_model.is_crib_dragging():
+            self.cancel_button['state'] = "disabled"
+        if self.crib_dragging_mode_model.selected_result is not None:
+            self.extend_button['state'] = "normal"
+        self.update_changed_entry_boxes()
+        error = self.crib_dragging_mode_model.extension_error
+        if error is not None:
+            self.label['text'] = "Extending failed: " + str(error)
+        elif self.label['text'] == "Extending the selected result":
+            self.label['text'] = "Extended the selected result"
 
     def refresh_word_box(self):
         if self.showing_all:
@@ -242,32 +435,67 @@ class CribDraggingScreen(tkinter.Frame):
             self.label['text'] = "Showing all results"
         self.toggle_button['text'] = "↓ Show Less"
         self.toggle_button['command'] = self.show_promising_words
-        self.words_box.update(self.get_dictionary_values(self.crib_dragging_mode_model.lock_filtered_all_results))
+        self.words_box.update(self.crib_dragging_mode_model.get_lock_filtered_all_result_list())
         self.on_selection_changed(self.words_box.get_selection())
         self.showing_all = True
 
     def show_promising_words(self):
-        if self.toggle_button['state'] == "normal":
-            self.label['text'] = "Showing auto-found promising results"
+        if self.crib_dragging_mode_model.is_crib_dragging():
+            self.label['text'] = "Searching, showing promising results found so far"
+        elif self.toggle_button['state'] == "normal":
+            self.label['text'] = "Showing the best auto-found promising results"
         self.toggle_button['text'] = "↑ Show More"
         self.toggle_button['command'] = self.show_all_words
-        self.words_box.update(self.get_dictionary_values(self.crib_dragging_mode_model.lock_filtered_promising_results))
+        self.words_box.update(list(self.crib_dragging_mode_model.lock_filtered_promising_results.values()))
         self.on_selection_changed(self.words_box.get_selection())
         self.showing_all = False
 
+    # The entry boxes are made once, then bound to whichever page of the strings is being shown
     def build_entry_boxes(self):
-        if len(self.entry_boxes_list) > 0:
-            for crib_dragging_pair in self.entry_boxes_list:
-                crib_dragging_pair.destroy()
-            self.entry_boxes_list = []
-
-        for i in range(len(self.crib_dragging_mode_model.string1)):
-            entry_box = AsciiCharacterPair(self.entry_boxes_container)
-            entry_box.bind_char1_changed(lambda char, entry_box=entry_box, i=i: self.on_char1_changed(entry_box, i, char))
-            entry_box.bind_char2_changed(lambda char, entry_box=entry_box, i=i: self.on_char2_changed(entry_box, i, char))
-            entry_box.bind_locked_changed(lambda value, i=i: self.on_locked_changed(i, value))
-            entry_box.grid(row=(i // self.max_characters_per_row), column=(i % self.max_characters_per_row), pady=(8, 0))
-            self.entry_boxes_list.append(entry_box)
+        if len(self.entry_boxes_list) == 0:
+            for slot in range(self.characters_per_page):
+                entry_box = AsciiCharacterPair(self.entry_boxes_container)
+                entry_box.bind_char1_changed(lambda char, slot=slot: self.on_char1_changed(self.page_start + slot, char))
+                entry_box.bind_char2_changed(lambda char, slot=slot: self.on_char2_changed(self.page_start + slot, char))
+                entry_box.bind_locked_changed(lambda value, slot=slot:
+                                              self.on_locked_changed(self.page_start + slot, value))
+                row = slot // self.max_characters_per_row
+                entry_box.grid(row=row, column=(slot % self.max_characters_per_row), pady=(8, 0))
+                self.entry_boxes_list.append(entry_box)
+        self.page_start = 0
+        self.load_page()
+
+    # Fill in the entry boxes from the characters of the current page, hiding any past the end of the strings
+    def load_page(self):
+        # Every character on the page is about to be read, so earlier changes don't need pushing separately
+        self.crib_dragging_mode_model.take_dirty_range()
+        self.loading_page = True
+        length = len(self.crib_dragging_mode_model.string1)
+        for slot in range(len(self.entry_boxes_list)):
+            entry_box = self.entry_boxes_list[slot]
+            i = self.page_start + slot
+            if i >= length:
+                entry_box.grid_remove()
+                continue
+            entry_box.grid()
+            # Locked boxes can't be changed, so the lock is put back on after the characters
+            entry_box.set_locked(False)
+            entry_box.set_char1(self.crib_dragging_mode_model.get_string1_char(i))
+            entry_box.set_char2(self.crib_dragging_mode_model.get_string2_char(i))
+            entry_box.set_locked(self.crib_dragging_mode_model.is_locked(i))
+        self.loading_page = False
+
+        page_end = min(self.page_start + self.characters_per_page, length)
+        self.page_label['text'] = "Characters " + str(min(self.page_start + 1, length)) + "-" + str(page_end) +\
+            " of " + str(length)
+        self.previous_page_button['state'] = "normal" if self.page_start > 0 else "disabled"
+        self.next_page_button['state'] = "normal" if page_end < length else "disabled"
+
+    def change_page(self, page_start):
+        self.set_highlight_for_selected_entry_boxes(False)
+        self.page_start = page_start
+        self.load_page()
+        self.set_highlight_for_selected_entry_boxes(True)
 
     def build_detail_bar_text(self):
         index = self.application_model.all_pairs.index(self.application_model.selected_pair)
@@ -286,15 +514,21 @@ class CribDraggingScreen(tkinter.Frame):
             return
         length = len(self.crib_dragging_mode_model.selected_result.ascii_string)
 
-        for i in range(index, index + length):
+        # Only the part of the selection on the current page has entry boxes
+        start = max(index, self.page_start)
+        end = min(index + length, self.page_start + len(self.entry_boxes_list))
+        for i in range(start, end):
+            entry_box = self.entry_boxes_list[i - self.page_start]
             if highlighted:
-                self.entry_boxes_list[i].box1.highlight()
-                self.entry_boxes_list[i].box2.highlight()
+                entry_box.box1.highlight()
+                entry_box.box2.highlight()
             else:
-                self.entry_boxes_list[i].box1.un_highlight()
-                self.entry_boxes_list[i].box2.un_highlight()
+                entry_box.box1.un_highlight()
+                entry_box.box2.un_highlight()
 
     def on_locked_changed(self, i, value):
+        if self.loading_page:
+            return
         if value:
             self.crib_dragging_mode_model.lock(i)
         else:
@@ -306,34 +540,48 @@ class CribDraggingScreen(tkinter.Frame):
         self.crib_dragging_mode_model.set_selected_result(selection)
         if selection is None:
             self.apply_button['state'] = "disabled"
+            self.extend_button['state'] = "disabled"
         else:
             self.apply_button['state'] = "normal"
+            self.extend_button['state'] = "normal"
             self.set_highlight_for_selected_entry_boxes(True)
 
-    def on_char1_changed(self, ascii_pair, i, char):
+    # Only a result the user picks moves to the page it starts on, so refreshing the list leaves the page alone
+    def on_result_picked(self, selection):
+        self.on_selection_changed(selection)
+        index = self.crib_dragging_mode_model.selected_result_index
+        if index is not None and not self.page_start <= index < self.page_start + self.characters_per_page:
+            self.change_page(index - index % self.characters_per_page)
+
+    def on_char1_changed(self, i, char):
+        if self.loading_page:
+            return
         self.crib_dragging_mode_model.set_string1_character(i, char)
-        ascii_pair.set_char2(self.crib_dragging_mode_model.get_string2_char(i))
+        self.update_changed_entry_boxes()
 
-    def on_char2_changed(self, ascii_pair, i, char):
+    def on_char2_changed(self, i, char):
+        if self.loading_page:
+            return
         self.crib_dragging_mode_model.set_string2_character(i, char)
-        ascii_pair.set_char1(self.crib_dragging_mode_model.get_string1_char(i))
+        self.update_changed_entry_boxes()
+
+    # Push the characters the model has changed to the entry boxes on the page in one go
+    # Boxes that already show the right character are left alone, and the change events the boxes raise are ignored
+    def update_changed_entry_boxes(self):
+        dirty_range = self.crib_dragging_mode_model.take_dirty_range()
+        if dirty_range is None:
+            return
+        start = max(dirty_range[0], self.page_start)
+        end = min(dirty_range[1], self.page_start + len(self.entry_boxes_list))
 
-    def update_all_entry_boxes(self):
-        for i in range(len(self.entry_boxes_list)):
+        self.loading_page = True
+        for i in range(start, end):
+            entry_box = self.entry_boxes_list[i - self.page_start]
             char1 = self.crib_dragging_mode_model.get_string1_char(i)
-            if self.entry_boxes_list[i].get_char1 != char1:
-                self.entry_boxes_list[i].set_char1(char1)
+            if entry_box.get_char1() != char1:
+                entry_box.set_char1(char1)
 
             char2 = self.crib_dragging_mode_model.get_string2_char(i)
-            if self.entry_boxes_list[i].get_char2 != char2:
-                self.entry_boxes_list[i].set_char2(char2)
-
-    @staticmethod
-    def get_dictionary_values(dictionary):
-        list = []
-        if len(dictionary) < 1:
-            return []
-        for i in range(max(dictionary.keys()) + 1):
-            if i in dictionary:
-                list.append(dictionary[i])
-        return list
+            if entry_box.get_char2() != char2:
+                entry_box.set_char2(char2)
+        self.loading_page = False
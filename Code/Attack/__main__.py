@@ -1,9 +1,69 @@
-from Application import *
-from Presentation import *
-import tkinter
+import argparse
 
 
 def main():
+    arguments = parse_arguments()
+    from Domain import CribDraggingService, Dictionary
+    CribDraggingService.dictionary_path = arguments.dictionary
+    CribDraggingService.dictionary_index_path = arguments.dictionary_index
+
+    if arguments.build_index is not None:
+        Dictionary.build_index(arguments.dictionary, arguments.build_index or arguments.dictionary_index)
+    elif arguments.batch is not None:
+        run_batch(arguments)
+    else:
+        run_gui()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(prog="Attack", description="Crib Dragging Tool")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="crib drag the ciphertexts in this file without the user interface, "
+                             "writing results to stdout as json lines")
+    parser.add_argument("--crib", action="append", default=[],
+                        help="crib to drag in batch mode, can be given more than once")
+    parser.add_argument("--cribs-file", metavar="PATH",
+                        help="file of new-line delimited cribs to drag in batch mode")
+    parser.add_argument("--all-pairs", action="store_true",
+                        help="drag every pair in batch mode instead of only the promising ones")
+    parser.add_argument("--all-texts", action="store_true",
+                        help="in batch mode, drag each crib against every ciphertext at once, assuming they all share "
+                             "a keystream, instead of pair by pair")
+    parser.add_argument("--workers", type=int,
+                        help="number of worker processes used to xor pairs")
+    parser.add_argument("--dictionary", metavar="PATH",
+                        help="new-line delimited list of lower-case english words (default dictionary.txt)")
+    parser.add_argument("--dictionary-index", metavar="PATH",
+                        help="prebuilt dictionary index, used when it was built from the word list and the word "
+                             "list hasn't changed since (default the word list path with an .idx extension)")
+    parser.add_argument("--build-index", metavar="PATH", nargs="?", const="",
+                        help="build a binary index of the dictionary that loads without parsing the word list")
+    return parser.parse_args()
+
+
+def run_batch(arguments):
+    # Imported here so batch mode doesn't load Tkinter
+    from Application import ApplicationModel
+    from Batch import BatchCribDragging
+
+    cribs = list(arguments.crib)
+    if arguments.cribs_file is not None:
+        cribs += [crib for crib in open(arguments.cribs_file, 'r').read().splitlines() if crib != ""]
+
+    data_model = ApplicationModel()
+    data_model.pair_workers = arguments.workers
+    BatchCribDragging(data_model).run(arguments.batch, cribs, arguments.all_pairs, arguments.all_texts)
+
+
+def run_gui():
+    from Application import ApplicationModel, NavigationModel
+    from Domain import CribDraggingService
+    from Presentation import LoadCipherTextsScreen, PairSelectionScreen, CribDraggingScreen
+    import tkinter
+
+    # Load the dictionary in the background so the window doesn't wait for it
+    CribDraggingService.warm_up()
+
     # Create Tkinter window
     root = tkinter.Tk()
     root.title("Crib Dragging Tool")